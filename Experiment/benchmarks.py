@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 19:40:15 2026
+
+Benchmarks of the critical paths, for all task presets, without a display, and
+except for get_events without psychopy:
+- PRFStim construction (texture size choice, base textures and the eight phases
+  as they are uploaded), time and peak memory, per window and texture size
+- per-frame texture selection: the if/elif chain of the original PRFStim.draw
+  (baseline_texture_index), PRFStim.draw and the run plan
+- create_trials (plan, trial table and run plan) versus run length
+- recording a key event in get_events, versus the number of events already logged
+- PRFTrial.get_events itself (keys, trial schedule, pulses and responses), on a
+  dry-run session (headless.py) with the null window and virtual clock of dryrun.py.
+  It needs exptools2 and psychopy, and is skipped if they are not installed
+
+Results are saved as JSON, and can be compared to a saved baseline. Run from within the Experiment folder:
+    python benchmarks.py run --output baseline.json
+    python benchmarks.py run --output new.json
+    python benchmarks.py compare baseline.json new.json --threshold 0.2
+"""
+
+import argparse
+import contextlib
+import dataclasses
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+from eventlog import EventRecorder
+from plan import (PHASE_TO_TEXTURE, RunPlan, bar_xy, create_plan, deg2pix, flicker_phase,
+                  load_config, settings_file_for_task, trial_table)
+from textures import CheckerboardTextures, texture_size
+
+
+PRESETS = ['1R', '2R', '4R', '4F', '1S']
+WINDOW_SIZES = [(1280, 720), (1920, 1080), (2560, 1440)]
+
+
+def _best_time(function, repeats=3):
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        function()
+        times.append(time.perf_counter()-t0)
+    return min(times)
+
+
+def _ns_per_call(function, number=20000, repeats=5):
+    return 1e9*min(timeit.repeat(function, number=number, repeat=repeats))/number
+
+
+def _result(value, unit):
+    return {'value':float(value), 'unit':unit}
+
+
+def construct_stim_textures(config, tex_nr_pix=None):
+    """what PRFStim.__init__ computes, with the upload of each phase to a GratingStim replaced by a float32 copy"""
+    win_height = config.win_size[1]
+    bar_width_in_screen_pixels = deg2pix(config.bar_width_deg, config)
+    if tex_nr_pix is None:
+        tex_nr_pix = texture_size(win_height, bar_width_in_screen_pixels, config.squares_in_bar)
+
+    textures = CheckerboardTextures(tex_nr_pix, bar_width_in_screen_pixels*tex_nr_pix/win_height, config.squares_in_bar)
+    for phase_nr in range(1, 9):
+        np.asarray(textures.phase(phase_nr), dtype=np.float32)
+    return textures
+
+
+def bench_stim(configs, window_sizes=WINDOW_SIZES, tex_sizes=(None,), repeats=3):
+    results = {}
+    for preset, config in configs.items():
+        for win_size in window_sizes:
+            win_config = dataclasses.replace(config, win_size=tuple(win_size))
+            for tex_nr_pix in tex_sizes:
+                name = 'prf_stim/%s/%dx%d/tex-%s'%(preset, win_size[0], win_size[1], 'auto' if tex_nr_pix is None else tex_nr_pix)
+
+                tracemalloc.start()
+                textures = construct_stim_textures(win_config, tex_nr_pix)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+
+                results[name+'/time'] = _result(_best_time(lambda: construct_stim_textures(win_config, tex_nr_pix), repeats), 's')
+                results[name+'/peak_memory'] = _result(peak/2**20, 'MB')
+                results[name+'/tex_nr_pix'] = _result(textures.tex_nr_pix, 'pixels')
+    return results
+
+
+def baseline_texture_index(time, flicker_frequency, bar_direction):
+    """texture chosen by the original PRFStim.draw (one if/elif branch per eighth of the flicker cycle), as an index"""
+    sin = np.sin(2*np.pi*time*flicker_frequency)
+    cos = np.cos(2*np.pi*time*flicker_frequency)
+
+    if sin > 0 and cos > 0 and cos > sin:
+        checkerboard = 0
+    elif sin > 0 and cos > 0 and cos < sin:
+        checkerboard = 1
+    elif sin > 0 and cos < 0 and np.abs(cos) < sin:
+        checkerboard = 2
+    elif sin > 0 and cos < 0 and np.abs(cos) > sin:
+        checkerboard = 3
+    elif sin < 0 and cos < 0 and cos < sin:
+        checkerboard = 4
+    elif sin < 0 and cos < 0 and cos > sin:
+        checkerboard = 5
+    elif sin < 0 and cos > 0 and cos < np.abs(sin):
+        checkerboard = 6
+    else:
+        checkerboard = 7
+
+    #bar moving up or down simply has reversed order of presentation
+    return checkerboard if bar_direction == 0 else 7-checkerboard
+
+
+def bench_texture_selection(configs):
+    results = {}
+    rng = np.random.default_rng(0)
+    for preset, config in configs.items():
+        plan = create_plan(config, rng=rng)
+        run_plan = RunPlan(plan['bar_orientation_at_TR'], plan['bar_pos_in_ori'], plan['bar_direction_at_TR'],
+                           plan['dot_switch_color_times'], config.flicker_frequency)
+        trial_nr = len(run_plan)//2
+        orientation = plan['bar_orientation_at_TR'][trial_nr]
+        pos_in_ori = plan['bar_pos_in_ori'][trial_nr]
+        bar_direction = plan['bar_direction_at_TR'][trial_nr]
+        t = 123.456
+
+        def baseline_path():
+            #the original PRFStim.draw, without the psychopy calls
+            np.cos((2.0*np.pi)*-orientation/360.0)*pos_in_ori, np.sin((2.0*np.pi)*-orientation/360.0)*pos_in_ori
+            baseline_texture_index(t, config.flicker_frequency, bar_direction)
+
+        def draw_path():
+            #PRFStim.draw, without the psychopy calls
+            bar_xy(orientation, pos_in_ori)
+            PHASE_TO_TEXTURE[int(bar_direction), flicker_phase(t, config.flicker_frequency)]
+
+        results['texture_selection/%s/baseline'%preset] = _result(_ns_per_call(baseline_path), 'ns')
+        results['texture_selection/%s/draw'%preset] = _result(_ns_per_call(draw_path), 'ns')
+        results['texture_selection/%s/run_plan'%preset] = _result(_ns_per_call(lambda: run_plan.frame(trial_nr, t)), 'ns')
+    return results
+
+
+def create_trials(config, rng):
+    """what PRFSession.create_trials computes"""
+    plan = create_plan(config, rng=rng)
+    trials = trial_table(config, plan['bar_orientation_at_TR'], plan['bar_pos_in_ori'], plan['bar_direction_at_TR'])
+    RunPlan(trials['bar_orientation'], trials['bar_pos_in_ori'], trials['bar_direction'],
+            plan['dot_switch_color_times'], config.flicker_frequency)
+    return trials
+
+
+def bench_create_trials(configs, length_factors=(1, 4, 16, 64), repeats=5):
+    results = {}
+    rng = np.random.default_rng(0)
+    for preset, config in configs.items():
+        for factor in length_factors:
+            #longer runs: more steps per bar pass and longer blanks
+            long_config = dataclasses.replace(config, bar_pass_steps=config.bar_pass_steps*factor,
+                                              blanks_length=config.blanks_length*factor)
+            name = 'create_trials/%s/x%d'%(preset, factor)
+            results[name+'/time'] = _result(_best_time(lambda: create_trials(long_config, rng), repeats), 's')
+            results[name+'/trials'] = _result(len(create_trials(long_config, rng)), 'trials')
+    return results
+
+
+def event_log(log_size, parameters):
+    """new EventRecorder with log_size responses already logged"""
+    recorder = EventRecorder()
+    for i in range(log_size):
+        recorder.record(i//10, 0.01*i, 'response', 0, 'b', parameters)
+    return recorder
+
+
+def bench_event_recorder(log_sizes=(100, 10000, 100000), number=1000, repeats=5):
+    results = {}
+    parameters = {'bar_orientation':0.0}
+    for log_size in log_sizes:
+        times = []
+        for _ in range(repeats):
+            recorder = event_log(log_size, parameters)
+            t0 = time.perf_counter()
+            for i in range(log_size, log_size+number):
+                recorder.record(i//10, 0.01*i, 'response', 0, 'b', parameters)
+            times.append(time.perf_counter()-t0)
+        results['get_events/record/%d'%log_size] = _result(1e9*min(times)/number, 'ns')
+    return results
+
+
+def _time_get_events(session, trial, key, number):
+    """time (s) of number calls of trial.get_events, one frame apart, with this key (or none) arriving at every frame"""
+    #get_events ignores pulses in the first 0.1 s of the run
+    start_time = max(session.clock.getTime(), 1.0)
+    session.virtual_time.now = session.clock.getLastResetTime()+start_time
+    if key is None:
+        session.scripted_keys, session.scripted_key_times = np.zeros(0, dtype=object), np.zeros(0)
+    else:
+        session.scripted_keys = np.array([key]*number, dtype=object)
+        session.scripted_key_times = start_time+session.virtual_time.frame_period*np.arange(1, number+1)
+    session._next_key = 0
+
+    elapsed = 0.0
+    for _ in range(number):
+        session.virtual_time.advance()
+        trial.exit_phase = False
+        t0 = time.perf_counter()
+        trial.get_events()
+        elapsed += time.perf_counter()-t0
+    return elapsed
+
+
+def bench_events(settings_file, log_sizes=(100, 10000, 100000), number=1000, repeats=5):
+    """PRFTrial.get_events of a trial in the middle of a dry-run session (headless.py), per frame without a key, with a
+    response and with a scanner pulse, versus the number of events already logged. with scanner sync and with the trial
+    schedule (without scanner sync). needs exptools2 and psychopy, but no display"""
+    from headless import DryRunSession
+    from trial import PRFTrial
+
+    config = load_config(settings_file)
+    modes = {'sync':dict(scanner_sync=True, trial_duration=config.TR),
+             'schedule':dict(scanner_sync=False, trial_duration=config.bar_step_length)}
+
+    results = {}
+    with tempfile.TemporaryDirectory() as output_dir:
+        for mode, config_changes in modes.items():
+            with contextlib.redirect_stdout(io.StringIO()):
+                session = DryRunSession('bench-events_'+mode, os.path.join(output_dir, mode), settings_file,
+                                        keys=(np.zeros(0, dtype=object), np.zeros(0)), config_changes=config_changes)
+            trial = PRFTrial.from_table(session, session.trial_table[session.trial_number//2])
+            session.current_trial = trial
+
+            keys = {'no key':None, 'response':'b'}
+            if session.config.scanner_sync:
+                keys['pulse'] = session.mri_trigger
+            session_recorder = session.event_recorder
+            try:
+                for log_size in log_sizes:
+                    for case, key in keys.items():
+                        times = []
+                        for _ in range(repeats):
+                            #a new log of log_size events, so that each repeat starts from the same log
+                            session.event_recorder = event_log(log_size, trial.parameters)
+                            times.append(_time_get_events(session, trial, key, number))
+                        results['get_events/%s/%s/%d'%(mode, case, log_size)] = _result(1e9*min(times)/number, 'ns')
+            finally:
+                session_recorder.close()
+                session.stimulus_log.close()
+    return results
+
+
+def run_benchmarks(presets=PRESETS, settings_dir='.', quick=False):
+    configs = {preset:load_config(settings_file_for_task('task-'+preset, settings_dir)) for preset in presets}
+
+    results = {}
+    if quick:
+        results.update(bench_stim(configs, window_sizes=[(1920, 1080)], repeats=1))
+        results.update(bench_create_trials(configs, length_factors=(1, 4), repeats=2))
+        results.update(bench_event_recorder(log_sizes=(100, 10000), repeats=2))
+    else:
+        results.update(bench_stim(configs, tex_sizes=(None, 1024, 2048, 4096)))
+        results.update(bench_create_trials(configs))
+        results.update(bench_event_recorder())
+    results.update(bench_texture_selection(configs))
+
+    #get_events runs on a dry-run session, which needs exptools2 and psychopy. its cost does not depend on the preset
+    settings_file = settings_file_for_task('task-'+presets[0], settings_dir)
+    try:
+        if quick:
+            results.update(bench_events(settings_file, log_sizes=(100, 10000), repeats=2))
+        else:
+            results.update(bench_events(settings_file))
+    except ImportError as error:
+        print(f"Skipping the get_events benchmarks, which need exptools2 and psychopy: {error}", file=sys.stderr)
+
+    return {'meta':{'date':datetime.now().isoformat(timespec='seconds'),
+                    'python':platform.python_version(),
+                    'numpy':np.__version__,
+                    'machine':platform.machine(),
+                    'platform':platform.platform()},
+            'results':results}
+
+
+#results that are sizes, not costs, are not compared
+NOT_COMPARED = ('/tex_nr_pix', '/trials')
+
+
+def compare(baseline, new, threshold=0.2):
+    """(name, baseline, new, ratio) of every result that got worse by more than the threshold (as a fraction)"""
+    regressions = []
+    for name, result in new['results'].items():
+        if name not in baseline['results'] or name.endswith(NOT_COMPARED):
+            continue
+        base_value = baseline['results'][name]['value']
+        if base_value > 0 and result['value'] > (1+threshold)*base_value:
+            regressions.append((name, base_value, result['value'], result['value']/base_value))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks of stimulus construction, frame path, trial planning and event logging")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run')
+    run_parser.add_argument('--output', default='benchmarks.json')
+    run_parser.add_argument('--presets', nargs='+', default=PRESETS)
+    run_parser.add_argument('--settings-dir', default='.')
+    run_parser.add_argument('--quick', action='store_true', help="fewer sizes and repeats")
+
+    compare_parser = subparsers.add_parser('compare')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('new')
+    compare_parser.add_argument('--threshold', type=float, default=0.2, help="allowed slowdown, as a fraction")
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        benchmarks = run_benchmarks(args.presets, args.settings_dir, args.quick)
+        with open(args.output, 'w') as f:
+            json.dump(benchmarks, f, indent=1)
+        for name, result in benchmarks['results'].items():
+            print("%-50s %12.4g %s"%(name, result['value'], result['unit']))
+        print("Saved %d results in %s"%(len(benchmarks['results']), args.output))
+
+    else:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.new) as f:
+            new = json.load(f)
+
+        regressions = compare(baseline, new, args.threshold)
+        for name, base_value, value, ratio in regressions:
+            print("REGRESSION %-50s %12.4g -> %12.4g (x%.2f)"%(name, base_value, value, ratio))
+        print("%d regressions (threshold %d%%)"%(len(regressions), 100*args.threshold))
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
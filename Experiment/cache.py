@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 10:03:18 2026
+
+Persistent, content-addressed cache for arrays that are expensive to generate
+(checkerboard textures, raised cosine mask). Arrays are stored as .npy files,
+loaded memory-mapped and validated against a checksum. The least recently used
+entries are evicted when the cache grows beyond its size limit.
+"""
+
+import hashlib
+import json
+import os
+import zlib
+
+import numpy as np
+
+opj = os.path.join
+
+
+def checksum(array):
+    """crc32 of the raw array bytes"""
+    return '%08x'%(zlib.crc32(memoryview(np.ascontiguousarray(array)).cast('B')) & 0xffffffff)
+
+
+class ArrayCache(object):
+
+    def __init__(self, cache_dir, max_size_mb=2048):
+        self.cache_dir = cache_dir
+        self.max_size = int(max_size_mb*2**20)
+
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+    def key(self, name, **params):
+        """key identifying an array by name and by all the parameters that went into generating it"""
+        description = json.dumps({'name':name, 'params':params}, sort_keys=True, default=float)
+        return name+'_'+hashlib.sha1(description.encode()).hexdigest()[:16]
+
+    def _paths(self, key):
+        return opj(self.cache_dir, key+'.npy'), opj(self.cache_dir, key+'.json')
+
+    def get(self, key):
+        """memory-mapped array for this key, or None on a miss or if the entry is corrupt"""
+        array_path, meta_path = self._paths(key)
+
+        if not (os.path.exists(array_path) and os.path.exists(meta_path)):
+            return None
+
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            array = np.load(array_path, mmap_mode='r')
+        except (OSError, ValueError):
+            self.remove(key)
+            return None
+
+        if list(array.shape) != meta['shape'] or str(array.dtype) != meta['dtype'] or checksum(array) != meta['checksum']:
+            print(f"Warning: cache entry {key} is corrupt. Regenerating.")
+            del array
+            self.remove(key)
+            return None
+
+        #mark as recently used, for eviction
+        os.utime(array_path)
+        return array
+
+    def put(self, key, array, **params):
+        """store the array, then evict the least recently used entries if the cache is too large"""
+        array_path, meta_path = self._paths(key)
+        array = np.ascontiguousarray(array)
+
+        #write to temporary files first, so that a crash never leaves a half-written entry
+        tmp_array_path = array_path+'.tmp.npy'
+        tmp_meta_path = meta_path+'.tmp'
+        np.save(tmp_array_path, array)
+        with open(tmp_meta_path, 'w') as f:
+            json.dump({'shape':list(array.shape),
+                       'dtype':str(array.dtype),
+                       'checksum':checksum(array),
+                       'params':params}, f, default=float)
+        os.replace(tmp_meta_path, meta_path)
+        os.replace(tmp_array_path, array_path)
+
+        self.evict(keep=key)
+
+    def get_or_create(self, name, create, **params):
+        """cached array for these parameters. on a miss, create() is called and its result stored"""
+        key = self.key(name, **params)
+        array = self.get(key)
+
+        if array is None:
+            array = create()
+            self.put(key, array, **params)
+
+        return array
+
+    def remove(self, key):
+        for path in self._paths(key):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def entries(self):
+        """(last use, size in bytes, key) of all entries, least recently used first"""
+        entries = []
+        for file in os.listdir(self.cache_dir):
+            if file.endswith('.npy') and not file.endswith('.tmp.npy'):
+                stat = os.stat(opj(self.cache_dir, file))
+                entries.append((stat.st_mtime, stat.st_size, file[:-4]))
+        return sorted(entries)
+
+    def size(self):
+        return sum(entry[1] for entry in self.entries())
+
+    def evict(self, keep=None):
+        entries = self.entries()
+        total_size = sum(entry[1] for entry in entries)
+
+        for _, size, key in entries:
+            if total_size <= self.max_size:
+                break
+            if key != keep:
+                self.remove(key)
+                total_size -= size
+
+    def clear(self):
+        for _, _, key in self.entries():
+            self.remove(key)
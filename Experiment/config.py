@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 16:10:52 2026
+
+Settings compiled once, at the start of the session, into an immutable object
+with typed, pre-converted fields. Missing or invalid settings raise an error
+before the window opens, and the frame loop reads plain attributes instead of
+nested dicts.
+
+To compare the per-frame cost of both, run from within the Experiment folder:
+    python config.py expsettings_1R.yml
+"""
+
+import argparse
+import timeit
+from dataclasses import dataclass
+
+
+_REQUIRED = object()
+
+
+def _optional(convert):
+    """converter that leaves empty settings (None) empty"""
+    return lambda value: None if value is None else convert(value)
+
+
+def _bool(value):
+    if not isinstance(value, bool):
+        raise ValueError(f"expected True or False, got {value!r}")
+    return value
+
+
+def _setting(settings, section, key, convert, default=_REQUIRED):
+    if section is None:
+        values = settings
+    else:
+        values = settings.get(section)
+        if values is None:
+            #optional sections (e.g. profiling) can be left out entirely
+            if default is not _REQUIRED:
+                return default
+            raise ValueError(f"Missing settings section '{section}' in settings file")
+
+    if key not in values:
+        if default is _REQUIRED:
+            raise ValueError(f"Missing setting '{key}'"+(f" in section '{section}'" if section else '')+" in settings file")
+        return default
+
+    try:
+        return convert(values[key])
+    except (TypeError, ValueError) as error:
+        raise ValueError(f"Invalid setting '{key}'"+(f" in section '{section}'" if section else '')+f": {error}")
+
+
+@dataclass(frozen=True)
+class PRFConfig:
+    __slots__ = ('operating_system', 'win_size', 'monitor_width', 'monitor_distance',
+                 'TR', 'topup_scan', 'topup_duration', 'sync_key',
+                 'trigger_emulator', 'trigger_jitter', 'dropped_pulse_rate',
+                 'scanner_sync', 'screenshot', 'screenshot_downsampling', 'screenshot_binarize_threshold',
+                 'squares_in_bar', 'bar_pass_steps', 'blanks_length', 'bar_orientations', 'bar_width_deg',
+                 'flicker_frequency', 'fixation_dot_size_deg', 'bar_step_length', 'trial_duration',
+                 'cache_directory', 'cache_size_mb',
+                 'response_interval', 'color_switch_interval', 'stream_events', 'input_polling_rate', 'metrics_port',
+                 'profile_run', 'profile_startup', 'profile_interval')
+
+    operating_system: str
+    win_size: tuple
+    monitor_width: float
+    monitor_distance: float
+
+    #mri
+    TR: float
+    topup_scan: bool
+    topup_duration: float
+    sync_key: str
+    trigger_emulator: bool
+    trigger_jitter: float
+    dropped_pulse_rate: float
+
+    #PRF stimulus settings
+    scanner_sync: bool
+    screenshot: bool
+    screenshot_downsampling: int
+    screenshot_binarize_threshold: float
+    squares_in_bar: int
+    bar_pass_steps: int
+    blanks_length: int
+    bar_orientations: tuple
+    bar_width_deg: float
+    flicker_frequency: float
+    fixation_dot_size_deg: float
+    bar_step_length: float
+    #duration of one trial: the TR if synced to the scanner, otherwise the bar step length
+    trial_duration: float
+    cache_directory: str
+    cache_size_mb: float
+
+    #Task settings
+    response_interval: float
+    color_switch_interval: float
+    stream_events: bool
+    input_polling_rate: float
+    metrics_port: int
+
+    #profiling
+    profile_run: bool
+    profile_startup: bool
+    profile_interval: float
+
+    def __reduce__(self):
+        #frozen instances with slots cannot be unpickled field by field (e.g. when sent to worker processes)
+        return (self.__class__, tuple(getattr(self, name) for name in self.__dataclass_fields__))
+
+    @classmethod
+    def from_settings(cls, settings):
+        """compile (and validate) the settings dict of a settings file"""
+        stim = 'PRF stimulus settings'
+        task = 'Task settings'
+
+        fields = dict(
+            operating_system=_setting(settings, None, 'operating system', str),
+            win_size=_setting(settings, 'window', 'size', lambda size: tuple(int(s) for s in size)),
+            monitor_width=_setting(settings, 'monitor', 'width', float),
+            monitor_distance=_setting(settings, 'monitor', 'distance', float),
+
+            TR=_setting(settings, 'mri', 'TR', float),
+            topup_scan=_setting(settings, 'mri', 'topup_scan', _bool),
+            topup_duration=_setting(settings, 'mri', 'topup_duration', float, 0.0),
+            sync_key=_setting(settings, 'mri', 'sync', str, 't'),
+            trigger_emulator=_setting(settings, 'mri', 'trigger emulator', _bool, False),
+            trigger_jitter=_setting(settings, 'mri', 'trigger jitter', float, 0.0),
+            dropped_pulse_rate=_setting(settings, 'mri', 'dropped pulse rate', float, 0.0),
+
+            scanner_sync=_setting(settings, stim, 'Scanner sync', _bool),
+            screenshot=_setting(settings, stim, 'Screenshot', _bool),
+            screenshot_downsampling=_setting(settings, stim, 'Screenshot downsampling', int, 1),
+            screenshot_binarize_threshold=_setting(settings, stim, 'Screenshot binarize threshold', _optional(float), None),
+            squares_in_bar=_setting(settings, stim, 'Squares in bar', int),
+            bar_pass_steps=_setting(settings, stim, 'Bar pass steps', int),
+            blanks_length=_setting(settings, stim, 'Blanks length', int),
+            bar_orientations=_setting(settings, stim, 'Bar orientations', lambda oris: tuple(float(o) for o in oris)),
+            bar_width_deg=_setting(settings, stim, 'Bar width in degrees', float),
+            flicker_frequency=_setting(settings, stim, 'Checkers motion speed', float),
+            fixation_dot_size_deg=_setting(settings, stim, 'Size fixation dot in degrees', float),
+            bar_step_length=_setting(settings, stim, 'Bar step length', float),
+            cache_directory=_setting(settings, stim, 'Cache directory', _optional(str), None),
+            cache_size_mb=_setting(settings, stim, 'Cache size in MB', float, 2048.0),
+
+            response_interval=_setting(settings, task, 'response interval', float),
+            color_switch_interval=_setting(settings, task, 'color switch interval', float),
+            stream_events=_setting(settings, task, 'stream events to file', _bool, False),
+            input_polling_rate=_setting(settings, task, 'input polling rate', _optional(float), None),
+            metrics_port=_setting(settings, task, 'metrics port', _optional(int), None),
+
+            profile_run=_setting(settings, 'profiling', 'profile run', _bool, False),
+            profile_startup=_setting(settings, 'profiling', 'profile startup', _bool, False),
+            profile_interval=_setting(settings, 'profiling', 'sampling interval in ms', float, 5.0)/1000)
+
+        if fields['topup_scan'] and 'topup_duration' not in settings['mri']:
+            raise ValueError("Missing setting 'topup_duration' in section 'mri' in settings file")
+        if fields['trigger_jitter'] < 0 or not 0 <= fields['dropped_pulse_rate'] < 1:
+            raise ValueError("'trigger jitter' must not be negative and 'dropped pulse rate' must be between 0 and 1")
+        if fields['input_polling_rate'] is not None and fields['input_polling_rate'] <= 0:
+            raise ValueError("'input polling rate' must be positive, or empty")
+        if fields['profile_interval'] <= 0:
+            raise ValueError("'sampling interval in ms' must be positive")
+        if fields['squares_in_bar'] < 1 or fields['bar_pass_steps'] < 1 or fields['blanks_length'] < 0:
+            raise ValueError("'Squares in bar' and 'Bar pass steps' must be positive and 'Blanks length' not negative")
+
+        fields['trial_duration'] = fields['TR'] if fields['scanner_sync'] else fields['bar_step_length']
+
+        return cls(**fields)
+
+
+def benchmark(settings, number=100000):
+    """time (ns) of one frame's worth of settings lookups in get_events, from the nested dict and from the compiled config"""
+    config = PRFConfig.from_settings(settings)
+
+    def nested():
+        settings['PRF stimulus settings']['Scanner sync']==True
+        float(settings['Task settings']['response interval'])
+        float(settings['Task settings']['response interval'])
+
+    def compiled():
+        config.scanner_sync
+        config.response_interval
+        config.response_interval
+
+    return {'nested dict (ns/frame)':1e9*min(timeit.repeat(nested, number=number, repeat=5))/number,
+            'compiled config (ns/frame)':1e9*min(timeit.repeat(compiled, number=number, repeat=5))/number}
+
+
+def main():
+    from plan import load_settings
+
+    parser = argparse.ArgumentParser(description="Validate a settings file and benchmark settings lookups")
+    parser.add_argument('settings_file')
+    args = parser.parse_args()
+
+    settings = load_settings(args.settings_file)
+    print(PRFConfig.from_settings(settings))
+    for name, ns in benchmark(settings).items():
+        print("%s: %.1f"%(name, ns))
+
+
+if __name__ == '__main__':
+    main()
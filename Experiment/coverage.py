@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 00:41:09 2026
+
+Visual field coverage of the task presets, as a check before a scanning day.
+From the bar sequence, bar width and aperture of a settings file (see
+design.stimulus_geometry), all bar positions are rasterized at once, and the
+report gives:
+- the time each pixel of the aperture is stimulated, and how uniform it is
+- mean stimulation time per eccentricity and per polar angle bin
+- gaps: pixels inside the aperture that are stimulated much less than the
+  median, and, for each bar orientation, pixels that no bar position covers
+- the aperture radius in degrees, to see what the half-size positioning on
+  mac ('operating system: mac') does to the stimulated field
+
+Settings files (and operating systems) are evaluated in parallel. Run from within the Experiment folder:
+    python coverage.py expsettings_1R.yml expsettings_2R.yml expsettings_4R.yml expsettings_4F.yml expsettings_1S.yml --os linux mac
+"""
+
+import argparse
+import dataclasses
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from design import aperture, bar_coverage, pixel_centers, stimulus_geometry
+from plan import deg2pix, load_config
+
+opj = os.path.join
+
+
+def stimulation_maps(config, resolution=100, chunk_size=64):
+    """stimulation time (s) of each pixel, and for each bar orientation the largest coverage of each pixel by any bar position"""
+    geometry = stimulus_geometry(config)
+    x, y, pixel_size = pixel_centers(resolution, geometry['aperture_radius'])
+    transmission = aperture(resolution, geometry['aperture_radius'], geometry['fringe_width'])
+
+    visible = np.flatnonzero(geometry['bar_orientation'] != -1)
+    bar_orientation = geometry['bar_orientation'][visible]
+    bar_pos_in_ori = geometry['bar_pos_in_ori'][visible]
+    orientations = np.unique(bar_orientation)
+
+    stimulation_time = np.zeros((resolution, resolution))
+    orientation_coverage = np.zeros((len(orientations), resolution, resolution))
+
+    #all trials of a chunk at once: (chunk, resolution, resolution)
+    for start in range(0, len(visible), chunk_size):
+        chunk = slice(start, start+chunk_size)
+        coverage = bar_coverage(x, y, pixel_size, bar_orientation[chunk, None, None], bar_pos_in_ori[chunk, None, None],
+                                geometry['bar_width'])
+        stimulation_time += coverage.sum(axis=0)
+        for k, orientation in enumerate(orientations):
+            in_orientation = bar_orientation[chunk] == orientation
+            if in_orientation.any():
+                np.maximum(orientation_coverage[k], coverage[in_orientation].max(axis=0), out=orientation_coverage[k])
+
+    return {'x':x, 'y':y,
+            'transmission':transmission,
+            'stimulation_time':transmission*stimulation_time*config.trial_duration,
+            'orientations':orientations,
+            'orientation_coverage':orientation_coverage,
+            'aperture_radius':geometry['aperture_radius'],
+            'fringe_width':geometry['fringe_width']}
+
+
+def _binned_mean(values, bins, nr_bins):
+    counts = np.bincount(bins, minlength=nr_bins)
+    return np.bincount(bins, weights=values, minlength=nr_bins)/np.maximum(counts, 1)
+
+
+def coverage_report(config, resolution=100, nr_eccentricity_bins=10, nr_angle_bins=16, gap_threshold=0.25, chunk_size=64):
+    """coverage summary, histograms and maps of one configuration"""
+    maps = stimulation_maps(config, resolution, chunk_size)
+    pix_per_deg = deg2pix(1.0, config)
+
+    eccentricity = np.hypot(maps['x'], maps['y'])
+    polar_angle = np.degrees(np.arctan2(maps['y'], maps['x'])) % 360
+    #the part of the aperture that is not in the raised cosine fringe
+    field = eccentricity <= maps['aperture_radius']*(1-maps['fringe_width'])
+    stimulation_time = maps['stimulation_time'][field]
+    median_time = np.median(stimulation_time)
+
+    aperture_radius_deg = maps['aperture_radius']/pix_per_deg
+    eccentricity_bins = np.minimum((eccentricity[field]/maps['aperture_radius']*nr_eccentricity_bins).astype(int), nr_eccentricity_bins-1)
+    angle_bins = np.minimum((polar_angle[field]/360*nr_angle_bins).astype(int), nr_angle_bins-1)
+
+    gaps = stimulation_time < gap_threshold*median_time
+    #for each orientation, pixels that are never covered by at least half of a bar
+    direction_gaps = (maps['orientation_coverage'][:, field] < 0.5).mean(axis=1)
+
+    summary = {'aperture radius (deg)':aperture_radius_deg,
+               'screen half height (deg)':config.win_size[1]/2/pix_per_deg,
+               'median stimulation time (s)':median_time,
+               'stimulation time range (s)':(stimulation_time.min(), stimulation_time.max()),
+               'coefficient of variation':stimulation_time.std()/max(stimulation_time.mean(), 1e-12),
+               'gap fraction':gaps.mean(),
+               'gap eccentricity range (deg)':((eccentricity[field][gaps].min()/pix_per_deg, eccentricity[field][gaps].max()/pix_per_deg)
+                                               if gaps.any() else None),
+               'worst orientation gap fraction':(direction_gaps.max() if len(direction_gaps) else 1.0),
+               'worst orientation':(maps['orientations'][np.argmax(direction_gaps)] if len(direction_gaps) else None)}
+
+    histograms = {'eccentricity_edges_deg':np.linspace(0, aperture_radius_deg, nr_eccentricity_bins+1),
+                  'eccentricity_stimulation_time':_binned_mean(stimulation_time, eccentricity_bins, nr_eccentricity_bins),
+                  'angle_edges_deg':np.linspace(0, 360, nr_angle_bins+1),
+                  'angle_stimulation_time':_binned_mean(stimulation_time, angle_bins, nr_angle_bins)}
+
+    return summary, histograms, maps
+
+
+def _report_job(settings_file, operating_system, resolution, gap_threshold, output_dir):
+    config = load_config(settings_file)
+    if operating_system is not None:
+        config = dataclasses.replace(config, operating_system=operating_system)
+
+    summary, histograms, maps = coverage_report(config, resolution, gap_threshold=gap_threshold)
+
+    if output_dir is not None:
+        task = os.path.splitext(os.path.basename(settings_file))[0].replace('expsettings_', '')
+        np.savez(opj(output_dir, f'coverage_{task}_{config.operating_system}.npz'),
+                 stimulation_time=maps['stimulation_time'],
+                 orientations=maps['orientations'],
+                 orientation_coverage=maps['orientation_coverage'],
+                 **histograms)
+    return settings_file, config.operating_system, summary, histograms
+
+
+def print_report(settings_file, operating_system, summary, histograms):
+    print(f"{settings_file} ({operating_system})")
+    print("  aperture radius %.2f deg (screen half height %.2f deg)"%(summary['aperture radius (deg)'], summary['screen half height (deg)']))
+    print("  stimulation time: median %.1f s, range %.1f-%.1f s, coefficient of variation %.2f"%(
+        summary['median stimulation time (s)'], *summary['stimulation time range (s)'], summary['coefficient of variation']))
+    print("  by eccentricity (s): "+" ".join("%.1f"%t for t in histograms['eccentricity_stimulation_time']))
+    print("  by polar angle (s):  "+" ".join("%.1f"%t for t in histograms['angle_stimulation_time']))
+    gap_range = summary['gap eccentricity range (deg)']
+    print("  gaps: %.2f%% of the aperture"%(100*summary['gap fraction'])+
+          (", at %.2f-%.2f deg"%gap_range if gap_range is not None else ""))
+    print("  not covered by any bar of one orientation: up to %.2f%% (orientation %s)"%(
+        100*summary['worst orientation gap fraction'], summary['worst orientation']))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Visual field coverage and sampling density of task presets")
+    parser.add_argument('settings_files', nargs='+')
+    parser.add_argument('--os', nargs='+', default=[None], dest='operating_systems',
+                        help="evaluate as if run on these operating systems (mac, linux, windows). default: as in the settings file")
+    parser.add_argument('--resolution', type=int, default=100, help="pixels across the aperture")
+    parser.add_argument('--gap-threshold', type=float, default=0.25, help="gaps are pixels stimulated less than this fraction of the median")
+    parser.add_argument('--max-gap-fraction', type=float, default=0.0, help="exit with an error if any preset has more gaps than this")
+    parser.add_argument('--max-orientation-gap-fraction', type=float, default=0.0,
+                        help="exit with an error if, in any preset, more of the aperture than this is not covered by any bar of one orientation")
+    parser.add_argument('--output-dir', default=None, help="save maps and histograms of each preset here")
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    if args.output_dir is not None and not os.path.exists(args.output_dir):
+        os.makedirs(args.output_dir)
+
+    jobs = [(settings_file, operating_system) for settings_file in args.settings_files for operating_system in args.operating_systems]
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(_report_job, settings_file, operating_system, args.resolution, args.gap_threshold, args.output_dir)
+                   for settings_file, operating_system in jobs]
+        reports = [future.result() for future in futures]
+
+    failed = []
+    for settings_file, operating_system, summary, histograms in reports:
+        print_report(settings_file, operating_system, summary, histograms)
+        if (summary['gap fraction'] > args.max_gap_fraction or
+                summary['worst orientation gap fraction'] > args.max_orientation_gap_fraction):
+            failed.append(f"{settings_file} ({operating_system})")
+
+    if failed:
+        print("Coverage gaps in: "+", ".join(failed))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
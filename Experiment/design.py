@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 12:02:33 2026
+
+Headless renderer of the pRF design matrix (the stimulus aperture at each TR),
+directly from a settings file. No psychopy and no display are needed: the bar
+sequence is reproduced with plan.bar_sequence, and the bar and raised cosine
+aperture are rasterized analytically, with area-weighted anti-aliasing.
+
+Usage, from within the Experiment folder:
+    python design.py expsettings_1R.yml expsettings_2R.yml --resolution 100
+"""
+
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from plan import load_config, bar_sequence, deg2pix
+
+opj = os.path.join
+
+
+def stimulus_geometry(config):
+    """bar orientation, position and width and aperture radius, in window pixels, as drawn by PRFSession"""
+    _, bar_orientation_at_TR, bar_pos_in_ori = bar_sequence(config, win_height=config.win_size[1])
+
+    #the mask stim is half size on mac, like the bar positions
+    if config.operating_system == 'mac':
+        aperture_radius = config.win_size[1]/4
+    else:
+        aperture_radius = config.win_size[1]/2
+
+    return {'bar_orientation':bar_orientation_at_TR,
+            'bar_pos_in_ori':bar_pos_in_ori,
+            'bar_width':deg2pix(config.bar_width_deg, config),
+            'aperture_radius':aperture_radius,
+            #fringe width of the raised cosine mask made in PRFSession.create_stimuli, as a fraction of the radius
+            'fringe_width':0.02}
+
+
+def pixel_centers(resolution, aperture_radius):
+    """x and y (window pixels, y up) of the centers of a resolution x resolution grid spanning the aperture"""
+    pixel_size = 2.0*aperture_radius/resolution
+    ls = -aperture_radius + pixel_size*(np.arange(resolution)+0.5)
+    x, y = np.meshgrid(ls, ls[::-1])
+    return x, y, pixel_size
+
+
+def aperture(resolution, aperture_radius, fringe_width, oversample=4):
+    """transmission (0-1) of the raised cosine aperture, averaged over each output pixel"""
+    x, y, _ = pixel_centers(resolution*oversample, aperture_radius)
+    r = np.sqrt(x**2+y**2)/aperture_radius
+
+    inner = 1-fringe_width
+    transmission = np.where(r <= inner, 1.0, 0.5*(1+np.cos(np.pi*np.clip((r-inner)/fringe_width, 0, 1))))
+
+    return transmission.reshape(resolution, oversample, resolution, oversample).mean(axis=(1, 3))
+
+
+def _trapezoid_cdf(z, a, b):
+    """cdf of a*U1 + b*U2, with U1, U2 uniform in [-1/2, 1/2] and a >= b > 0"""
+    z = z + (a+b)/2
+    return np.where(z <= 0, 0.0,
+           np.where(z < b, z**2/(2*a*b),
+           np.where(z < a, (z-b/2)/a,
+           np.where(z < a+b, 1-(a+b-z)**2/(2*a*b), 1.0))))
+
+
+def bar_coverage(x, y, pixel_size, bar_orientation, bar_pos_in_ori, bar_width):
+    """fraction of each (square) pixel covered by the bar, computed exactly for an infinitely long bar.
+    orientation and position can also be arrays that broadcast with x and y, e.g. (nr_trials, 1, 1), for many trials at once"""
+    angle = (2.0*np.pi)*-np.asarray(bar_orientation, dtype=float)/360.0
+    normal_x, normal_y = np.cos(angle), np.sin(angle)
+
+    #distance of the pixel center from the bar center, along the bar motion
+    distance = x*normal_x + y*normal_y - bar_pos_in_ori
+
+    #the projection of a square pixel onto the normal is trapezoidally distributed
+    a = pixel_size*np.maximum(np.abs(normal_x), np.abs(normal_y))
+    b = np.maximum(pixel_size*np.minimum(np.abs(normal_x), np.abs(normal_y)), 1e-9*pixel_size)
+
+    return _trapezoid_cdf(bar_width/2 - distance, a, b) - _trapezoid_cdf(-bar_width/2 - distance, a, b)
+
+
+def render(geometry, resolution, trials, oversample=4, binarize=None):
+    """stimulus aperture of the given trials, as a (resolution, resolution, len(trials)) array"""
+    x, y, pixel_size = pixel_centers(resolution, geometry['aperture_radius'])
+    transmission = aperture(resolution, geometry['aperture_radius'], geometry['fringe_width'], oversample)
+
+    frames = np.zeros((resolution, resolution, len(trials)), dtype=np.float32)
+
+    for i, trial in enumerate(trials):
+        #blank periods
+        if geometry['bar_orientation'][trial] == -1:
+            continue
+
+        frames[:,:,i] = transmission*bar_coverage(x, y, pixel_size,
+                                                  geometry['bar_orientation'][trial],
+                                                  geometry['bar_pos_in_ori'][trial],
+                                                  geometry['bar_width'])
+
+    if binarize is not None:
+        frames = (frames > binarize).astype(np.float32)
+
+    return frames
+
+
+def _render_chunk(output_file, geometry, resolution, start, stop, oversample, binarize):
+    design_matrix = np.load(output_file, mmap_mode='r+')
+    design_matrix[:,:,start:stop] = render(geometry, resolution, range(start, stop), oversample, binarize)
+    design_matrix.flush()
+    return stop-start
+
+
+def create_design_matrices(settings_files, output_dir, resolution=100, chunk_size=32, oversample=4, binarize=None, n_workers=None):
+    """write the design matrix of each settings file to <output_dir>/design_matrix_<task>.npy, rendering TR chunks in parallel"""
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    output_files = []
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        futures = []
+
+        for settings_file in settings_files:
+            geometry = stimulus_geometry(load_config(settings_file))
+            nr_trials = len(geometry['bar_orientation'])
+
+            task = os.path.splitext(os.path.basename(settings_file))[0].replace('expsettings_', '')
+            output_file = opj(output_dir, f'design_matrix_{task}.npy')
+
+            #preallocate on disk. each worker writes its own chunk of TRs
+            np.lib.format.open_memmap(output_file, mode='w+', dtype=np.float32, shape=(resolution, resolution, nr_trials)).flush()
+
+            for start in range(0, nr_trials, chunk_size):
+                futures.append(pool.submit(_render_chunk, output_file, geometry, resolution,
+                                           start, min(start+chunk_size, nr_trials), oversample, binarize))
+            output_files.append(output_file)
+
+        for future in futures:
+            future.result()
+
+    return output_files
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create pRF design matrices (stimulus aperture at each TR) from settings files, without a display")
+    parser.add_argument('settings_files', nargs='+')
+    parser.add_argument('--output-dir', default='./design_matrices')
+    parser.add_argument('--resolution', type=int, default=100, help="design matrix size in pixels, spanning the aperture")
+    parser.add_argument('--chunk-size', type=int, default=32, help="number of TRs rendered per job")
+    parser.add_argument('--oversample', type=int, default=4, help="oversampling of the raised cosine aperture")
+    parser.add_argument('--binarize', type=float, default=None, help="threshold to binarize the design matrix")
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    for output_file in create_design_matrices(args.settings_files, args.output_dir, args.resolution, args.chunk_size,
+                                              args.oversample, args.binarize, args.workers):
+        print("Saved %s %s"%(output_file, np.load(output_file, mmap_mode='r').shape))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 18:20:37 2026
+
+Dry run of a whole PRFSession, faster than real time and without a display.
+The session clocks are replaced by virtual clocks that advance by one frame
+period at each flip of a null window, the stimuli draw nothing, and get_events
+is fed a scripted key stream: scanner pulses every TR (with the trigger jitter
+and dropped pulse rate of the settings file) and responses to the dot switches.
+Trials, draw_stimulus, dot switching, scoring and all logs run as usual.
+exptools2's Session.__init__ needs a display, so HeadlessSetup sets up the
+attributes of the session that the run uses (SESSION_ATTRIBUTES) itself. The
+sessions themselves are in headless.py. The stand-ins in this module do not
+need psychopy, so that they can also be used by benchmarks.py and tested
+without a display.
+
+To check every preset before a scanning day, run from within the Experiment folder:
+    python dryrun.py expsettings_*.yml
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from triggers import pulse_schedule
+
+opj = os.path.join
+
+
+class VirtualTime(object):
+    """time that only advances when a frame is flipped"""
+
+    def __init__(self, frame_rate=60.0):
+        self.now = 0.0
+        self.frame_period = 1.0/frame_rate
+
+    def advance(self):
+        self.now += self.frame_period
+        return self.now
+
+
+class VirtualClock(object):
+    """same interface as psychopy.core.Clock, on the virtual time"""
+
+    def __init__(self, virtual_time):
+        self.virtual_time = virtual_time
+        self._time_at_last_reset = virtual_time.now
+
+    def getTime(self):
+        return self.virtual_time.now-self._time_at_last_reset
+
+    def getLastResetTime(self):
+        return self._time_at_last_reset
+
+    def reset(self, newT=0.0):
+        self._time_at_last_reset = self.virtual_time.now+newT
+
+    def addTime(self, t):
+        self._time_at_last_reset += t
+
+    add = addTime
+
+
+class NullWindow(object):
+    """window that draws nothing. each flip advances the virtual time by one frame"""
+
+    def __init__(self, size, virtual_time):
+        self.size = np.array(size)
+        self.virtual_time = virtual_time
+        self.monitorFramePeriod = virtual_time.frame_period
+        self.units = 'pix'
+        self.mouseVisible = False
+        self.recordFrameIntervals = False
+        self.frameIntervals = []
+        self.movieFrames = []
+        self._to_call_on_flip = []
+
+    def callOnFlip(self, function, *args, **kwargs):
+        self._to_call_on_flip.append((function, args, kwargs))
+
+    def flip(self, clearBuffer=True):
+        flip_time = self.virtual_time.advance()
+        if self.recordFrameIntervals:
+            self.frameIntervals.append(self.virtual_time.frame_period)
+
+        to_call, self._to_call_on_flip = self._to_call_on_flip, []
+        for function, args, kwargs in to_call:
+            function(*args, **kwargs)
+        return flip_time
+
+    def getMovieFrame(self, buffer='front'):
+        #uniform gray background
+        self.movieFrames.append(np.full((self.size[1], self.size[0], 3), 128, dtype=np.uint8))
+
+    def setMouseVisible(self, visible):
+        self.mouseVisible = visible
+
+    def close(self):
+        pass
+
+
+class NullStim(object):
+
+    def draw(self, *args, **kwargs):
+        pass
+
+    draw_texture = draw
+
+
+#attributes set by exptools2's Session.__init__ that PRFSession, PRFTrial and the exptools2 methods they call
+#(start_experiment, Trial.run, close) use
+SESSION_ATTRIBUTES = ('output_str', 'output_dir', 'settings_file', 'clock', 'timer', 'exp_start', 'exp_stop',
+                      'current_trial', 'global_log', 'nr_frames', 'first_trial', 'closed', 'settings', 'monitor',
+                      'win', 'mouse', 'logfile', 'default_fix', 'mri_trigger', 'mri_simulator', 'tracker')
+
+
+class HeadlessSetup(object):
+    """
+    the SESSION_ATTRIBUTES, on virtual clocks and a null window. the settings, monitor and log file are created by the
+    _load_settings, _create_monitor and _create_logfile of the session class it is mixed into (see headless.py)
+    """
+
+    frame_rate = 60.0
+
+    def __init__(self, output_str, output_dir=None, settings_file=None):
+        self.virtual_time = VirtualTime(self.frame_rate)
+        self.clock = VirtualClock(self.virtual_time)
+        self.timer = VirtualClock(self.virtual_time)
+
+        self.output_str = output_str
+        self.output_dir = output_dir
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+        self.settings_file = settings_file
+        self.exp_start = None
+        self.exp_stop = None
+        self.current_trial = None
+        self.global_log = pd.DataFrame(columns=['trial_nr', 'onset', 'event_type', 'phase', 'response', 'nr_frames'])
+        self.nr_frames = 0
+        self.first_trial = True
+        self.closed = False
+
+        self.settings = self._load_settings()
+        self.monitor = self._create_monitor()
+        self.win = self._create_window()
+        self.logfile = self._create_logfile()
+        #these need a window: the dry run does not use them
+        self.mouse = None
+        self.default_fix = NullStim()
+        #pulses are part of the scripted key stream
+        self.mri_trigger = None
+        self.mri_simulator = None
+        self.tracker = None
+
+    def _create_window(self):
+        return NullWindow(self.settings['window']['size'], self.virtual_time)
+
+    def display_text(self, text, keys=None, duration=None, **kwargs):
+        print(text)
+
+
+def scripted_keys(config, trial_number, dot_switch_color_times, response_key='b',
+                  hit_rate=0.9, reaction_time=0.45, reaction_time_sd=0.1, rng=None):
+    """(keys, times) of the scanner pulses after the start of the experiment and of the responses to the dot switches"""
+    if rng is None:
+        rng = np.random.default_rng()
+
+    keys, times = [], []
+
+    if config.scanner_sync:
+        #one pulse for every trial but the first. the pulse at time 0 is the one the session waits for
+        nr_pulses = 0
+        for pulse_time, dropped in pulse_schedule(config.TR, config.trigger_jitter, config.dropped_pulse_rate, rng):
+            if pulse_time == 0.0 or dropped:
+                continue
+            keys.append(config.sync_key)
+            times.append(pulse_time)
+            nr_pulses += 1
+            if nr_pulses == trial_number:
+                break
+
+    responded = rng.random(len(dot_switch_color_times)) < hit_rate
+    response_times = dot_switch_color_times[responded] + \
+        np.clip(rng.normal(reaction_time, reaction_time_sd, responded.sum()), 0.1, None)
+    keys.extend([response_key]*len(response_times))
+    times.extend(response_times.tolist())
+
+    order = np.argsort(times, kind='stable')
+    return np.array(keys, dtype=object)[order], np.array(times, dtype=float)[order]
+
+
+def dry_run(settings_file, output_dir='./dryrun', plan_file=None, frame_rate=60.0, seed=0):
+    """runs a whole session of a settings file, and returns its duration in virtual and in real time"""
+    #exptools2 and psychopy are only imported to run a session (see headless.py)
+    from headless import DryRunSession
+
+    output_str = 'dry-run_'+os.path.basename(settings_file)[len('expsettings_'):-len('.yml')]
+    session = DryRunSession(output_str=output_str, output_dir=opj(output_dir, output_str+'_Logs'), settings_file=settings_file,
+                            plan_file=plan_file, frame_rate=frame_rate, seed=seed)
+
+    t0 = time.perf_counter()
+    session.run()
+    return {'Virtual duration (s)':session.clock.getTime(),
+            'Real duration (s)':time.perf_counter()-t0,
+            'Frames':session.nr_frames}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run whole sessions faster than real time, without a display")
+    parser.add_argument('settings_files', nargs='+')
+    parser.add_argument('--output-dir', default='./dryrun')
+    parser.add_argument('--plan', default=None, help="run plan created with plan.py")
+    parser.add_argument('--frame-rate', type=float, default=60.0)
+    parser.add_argument('--seed', type=int, default=0, help="seed of the scripted pulses and responses")
+    args = parser.parse_args(argv)
+
+    for settings_file in args.settings_files:
+        result = dry_run(settings_file, args.output_dir, args.plan, args.frame_rate, args.seed)
+        print(settings_file+": "+", ".join(f"{name} {value:.2f}" if isinstance(value, float) else f"{name} {value}"
+                                           for name, value in result.items()))
+
+
+if __name__ == '__main__':
+    main()
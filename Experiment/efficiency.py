@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 22:04:51 2026
+
+Design efficiency of candidate bar sequences, without psychopy or a display.
+Each candidate (order of the bar orientations, placement of the blanks, bar
+pass steps and bar width) is turned into a trial sequence with plan.bar_sequence
+and rendered at low resolution with design.render. The predicted timecourses of
+a grid of Gaussian pRFs (centers x sizes) are convolved with a canonical HRF,
+and the candidate is scored by how well the pRF parameters are recovered from
+noisy timecourses (grid fit by maximum correlation), and by how confusable
+distant pRFs are. Everything is vectorized over pRFs; candidates are evaluated
+in parallel.
+
+Run from within the Experiment folder:
+    python efficiency.py expsettings_1R.yml --orders 200 --blank-placements 5 --bar-pass-steps 16 20 --top 10
+"""
+
+import argparse
+import dataclasses
+import math
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+
+import numpy as np
+
+from design import render, stimulus_geometry, pixel_centers
+from plan import deg2pix, load_config
+
+
+SCORE_DTYPE = np.dtype([('candidate', np.int32),
+                        ('bar_pass_steps', np.int32),
+                        ('bar_width_deg', np.float64),
+                        ('nr_trials', np.int32),
+                        ('recovery_rate', np.float64),
+                        ('center_error_deg', np.float64),
+                        ('size_error_deg', np.float64),
+                        ('confusability', np.float64)])
+
+
+def canonical_hrf(sampling_interval, length=32.0):
+    """SPM double gamma HRF, sampled every sampling_interval seconds"""
+    t = np.arange(0, length, sampling_interval)
+    peak = t**5*np.exp(-t)/math.gamma(6)
+    undershoot = t**15*np.exp(-t)/math.gamma(16)
+    hrf = peak - undershoot/6
+    return hrf/hrf.sum()
+
+
+def convolve_hrf(timecourses, hrf):
+    """causal convolution of every row with the HRF, via the FFT"""
+    n = timecourses.shape[-1]
+    n_fft = 2**int(np.ceil(np.log2(n+len(hrf))))
+    return np.fft.irfft(np.fft.rfft(timecourses, n_fft)*np.fft.rfft(hrf, n_fft), n_fft)[..., :n]
+
+
+def prf_grid(aperture_radius_deg, nr_centers=15, sizes_deg=(0.5, 1.0, 2.0, 4.0)):
+    """(x, y, size) in degrees of pRFs on a square grid of centers inside the aperture, for each size"""
+    ls = np.linspace(-aperture_radius_deg, aperture_radius_deg, nr_centers)
+    x, y = np.meshgrid(ls, ls)
+    inside = x**2+y**2 <= aperture_radius_deg**2
+    x, y = x[inside], y[inside]
+
+    sizes = np.asarray(sizes_deg, dtype=float)
+    return np.repeat(x, len(sizes)), np.repeat(y, len(sizes)), np.tile(sizes, len(x))
+
+
+def gaussian_prfs(prfs, pixel_x_deg, pixel_y_deg):
+    """(nr_prfs, nr_pixels) Gaussian pRFs, normalized to unit sum"""
+    x, y, size = prfs
+    dx = pixel_x_deg.ravel()[None, :] - x[:, None]
+    dy = pixel_y_deg.ravel()[None, :] - y[:, None]
+    g = np.exp(-(dx**2+dy**2)/(2*size[:, None]**2))
+    return g/np.maximum(g.sum(axis=1, keepdims=True), 1e-12)
+
+
+def _zscore(timecourses):
+    centered = timecourses - timecourses.mean(axis=1, keepdims=True)
+    norm = np.linalg.norm(centered, axis=1, keepdims=True)
+    return centered/np.maximum(norm, 1e-12)
+
+
+def evaluate(config, resolution=30, nr_centers=15, sizes_deg=(0.5, 1.0, 2.0, 4.0), snr=1.0, seed=0):
+    """design efficiency scores of one configuration"""
+    geometry = stimulus_geometry(config)
+    design_matrix = render(geometry, resolution, range(len(geometry['bar_orientation'])))
+
+    pix_per_deg = deg2pix(1.0, config)
+    x, y, _ = pixel_centers(resolution, geometry['aperture_radius'])
+    prfs = prf_grid(geometry['aperture_radius']/pix_per_deg, nr_centers, sizes_deg)
+    weights = gaussian_prfs(prfs, x/pix_per_deg, y/pix_per_deg)
+
+    #predicted timecourses of all pRFs at once: (nr_prfs, nr_pixels) @ (nr_pixels, nr_trials).
+    #one sample per trial, which lasts one TR with scanner sync, and the bar step length without
+    timecourses = convolve_hrf(weights @ design_matrix.reshape(-1, design_matrix.shape[-1]).astype(float),
+                               canonical_hrf(config.trial_duration))
+    models = _zscore(timecourses)
+
+    #recoverability: grid fit of noisy timecourses by maximum correlation
+    rng = np.random.default_rng(seed)
+    signal_sd = timecourses.std(axis=1, keepdims=True)
+    noisy = timecourses + rng.standard_normal(timecourses.shape)*signal_sd/snr
+    best = np.argmax(_zscore(noisy) @ models.T, axis=1)
+
+    x_prf, y_prf, size_prf = prfs
+    center_error = np.hypot(x_prf[best]-x_prf, y_prf[best]-y_prf)
+    size_error = np.abs(size_prf[best]-size_prf)
+
+    #confusability: highest correlation with a pRF whose center is further away than both sizes
+    correlations = models @ models.T
+    distance = np.hypot(x_prf[:, None]-x_prf[None, :], y_prf[:, None]-y_prf[None, :])
+    distant = distance > np.maximum(size_prf[:, None], size_prf[None, :])
+    confusability = np.where(distant, correlations, -1.0).max(axis=1)
+
+    return {'nr_trials':design_matrix.shape[-1],
+            'recovery_rate':float(np.mean(best == np.arange(len(best)))),
+            'center_error_deg':float(center_error.mean()),
+            'size_error_deg':float(size_error.mean()),
+            'confusability':float(np.nanmean(confusability))}
+
+
+def place_blanks(orientations, blank_positions):
+    """orientation list with a blank (-1) inserted before each of the given positions"""
+    sequence = []
+    for position, orientation in enumerate(list(orientations)+[None]):
+        sequence.extend([-1.0]*int(np.sum(np.asarray(blank_positions) == position)))
+        if orientation is not None:
+            sequence.append(float(orientation))
+    return tuple(sequence)
+
+
+def candidate_sequences(base_orientations, nr_orders, nr_blank_placements, rng):
+    """orientation sequences: random orders of the bar orientations, each with random blank placements"""
+    base_orientations = np.asarray(base_orientations, dtype=float)
+    bars = base_orientations[base_orientations != -1]
+    nr_blanks = int(np.sum(base_orientations == -1))
+
+    sequences = [tuple(base_orientations)]
+    for _ in range(nr_orders):
+        order = rng.permutation(bars)
+        for _ in range(nr_blank_placements):
+            sequences.append(place_blanks(order, np.sort(rng.integers(0, len(bars)+1, nr_blanks))))
+
+    #the same sequence can be drawn twice
+    return list(dict.fromkeys(sequences))
+
+
+def _evaluate_candidates(base_config, candidates, kwargs):
+    return [evaluate(dataclasses.replace(base_config, bar_orientations=orientations,
+                                         bar_pass_steps=bar_pass_steps, bar_width_deg=bar_width_deg), **kwargs)
+            for orientations, bar_pass_steps, bar_width_deg in candidates]
+
+
+def search(base_config, sequences, bar_pass_steps, bar_widths_deg, n_workers=None, chunk_size=16, **kwargs):
+    """scores (SCORE_DTYPE, best first) and orientation sequences of all candidates"""
+    candidates = list(product(sequences, bar_pass_steps, bar_widths_deg))
+    chunks = [candidates[i:i+chunk_size] for i in range(0, len(candidates), chunk_size)]
+
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        results = [result for chunk in pool.map(_evaluate_candidates, [base_config]*len(chunks), chunks, [kwargs]*len(chunks))
+                   for result in chunk]
+
+    scores = np.zeros(len(candidates), dtype=SCORE_DTYPE)
+    scores['candidate'] = np.arange(len(candidates))
+    scores['bar_pass_steps'] = [c[1] for c in candidates]
+    scores['bar_width_deg'] = [c[2] for c in candidates]
+    for field in SCORE_DTYPE.names[3:]:
+        scores[field] = [r[field] for r in results]
+
+    #best first: lowest center error, then least confusable
+    order = np.lexsort((scores['confusability'], scores['center_error_deg']))
+    return scores[order], [candidates[i][0] for i in order]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score and search bar orientation sequences by pRF design efficiency")
+    parser.add_argument('settings_file', help="the other settings (TR or bar step length, blanks length, screen) are taken from this file")
+    parser.add_argument('--orders', type=int, default=50, help="number of random orders of the bar orientations")
+    parser.add_argument('--blank-placements', type=int, default=5, help="number of random blank placements per order")
+    parser.add_argument('--bar-pass-steps', type=int, nargs='+', default=None)
+    parser.add_argument('--bar-widths', type=float, nargs='+', default=None, help="bar widths in degrees")
+    parser.add_argument('--resolution', type=int, default=30)
+    parser.add_argument('--centers', type=int, default=15, help="pRF centers per side of the grid")
+    parser.add_argument('--sizes', type=float, nargs='+', default=[0.5, 1.0, 2.0, 4.0], help="pRF sizes in degrees")
+    parser.add_argument('--snr', type=float, default=1.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--output', default=None, help="save all scores and sequences to this .npz file")
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    config = load_config(args.settings_file)
+    sequences = candidate_sequences(config.bar_orientations, args.orders, args.blank_placements, np.random.default_rng(args.seed))
+    scores, sequences = search(config, sequences,
+                               args.bar_pass_steps or [config.bar_pass_steps],
+                               args.bar_widths or [config.bar_width_deg],
+                               n_workers=args.workers, resolution=args.resolution, nr_centers=args.centers,
+                               sizes_deg=tuple(args.sizes), snr=args.snr, seed=args.seed)
+
+    for score, sequence in zip(scores[:args.top], sequences[:args.top]):
+        print(f"center error {score['center_error_deg']:.3f} deg, size error {score['size_error_deg']:.3f} deg, "
+              f"recovered {100*score['recovery_rate']:.0f}%, confusability {score['confusability']:.3f}, "
+              f"{score['nr_trials']} trials, Bar pass steps: {score['bar_pass_steps']}, Bar width in degrees: {score['bar_width_deg']}")
+        print(f"    Bar orientations: [{', '.join('%g'%o for o in sequence)}]")
+
+    if args.output is not None:
+        np.savez(args.output, scores=scores, bar_orientations=np.array(sequences, dtype=float))
+
+
+if __name__ == '__main__':
+    main()
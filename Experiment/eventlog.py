@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 13:15:07 2026
+
+Preallocated, fixed-dtype recorder for key events (scanner pulses and responses).
+Recording an event is a single row assignment into a numpy structured array,
+optionally followed by an append to a binary file, so that nothing is lost if
+the experiment crashes. The pandas DataFrame is only built when the session closes.
+"""
+
+import numpy as np
+
+
+EVENT_TYPES = ['pulse', 'response']
+EVENT_CODES = {event_type:code for code, event_type in enumerate(EVENT_TYPES)}
+
+EVENT_DTYPE = np.dtype([('trial_nr', np.int32),
+                        ('onset', np.float64),
+                        ('event_type', np.int8),
+                        ('phase', np.int16),
+                        ('response', 'S16')])
+
+
+class EventRecorder(object):
+
+    def __init__(self, capacity=4096, stream_file=None):
+        self.events = np.zeros(capacity, dtype=EVENT_DTYPE)
+        self.nr_events = 0
+        #trial parameters are constant within a trial, so they are stored once per trial, not per event
+        self.trial_parameters = {}
+        self._nr_merged = 0
+
+        if stream_file is not None:
+            self.stream = open(stream_file, 'ab')
+        else:
+            self.stream = None
+
+    def __len__(self):
+        return self.nr_events
+
+    def record(self, trial_nr, onset, event_type, phase, response, parameters=None):
+        if self.nr_events == len(self.events):
+            #amortized O(1): only happens when the (generous) initial capacity is exceeded
+            self.events = np.concatenate([self.events, np.zeros(len(self.events), dtype=EVENT_DTYPE)])
+
+        self.events[self.nr_events] = (trial_nr, onset, EVENT_CODES[event_type], phase, response)
+
+        if parameters and trial_nr not in self.trial_parameters:
+            self.trial_parameters[trial_nr] = dict(parameters)
+
+        if self.stream is not None:
+            self.stream.write(self.events[self.nr_events:self.nr_events+1].tobytes())
+            self.stream.flush()
+
+        self.nr_events += 1
+
+    def onsets(self, event_type):
+        """onsets of all recorded events of one type"""
+        events = self.events[:self.nr_events]
+        return events['onset'][events['event_type'] == EVENT_CODES[event_type]]
+
+    def to_dataframe(self, start=0):
+        """events (from event number start onwards) in the format of the exptools2 global log"""
+        import pandas as pd
+
+        events = self.events[start:self.nr_events]
+        log = pd.DataFrame({'trial_nr':events['trial_nr'],
+                            'onset':events['onset'],
+                            'event_type':np.array(EVENT_TYPES, dtype=object)[events['event_type']],
+                            'phase':events['phase'],
+                            'response':np.char.decode(events['response'])})
+
+        if self.trial_parameters:
+            parameters = pd.DataFrame.from_dict(self.trial_parameters, orient='index')
+            log = log.join(parameters, on='trial_nr')
+
+        return log
+
+    def merge_into(self, global_log):
+        """global log with the events not merged before added, sorted by onset"""
+        import pandas as pd
+
+        if self._nr_merged == self.nr_events:
+            return global_log
+
+        new_events = self.to_dataframe(start=self._nr_merged)
+        self._nr_merged = self.nr_events
+
+        return pd.concat([global_log, new_events], ignore_index=True).sort_values('onset', kind='stable').reset_index(drop=True)
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+
+    @staticmethod
+    def load(stream_file):
+        """events streamed to a file, e.g. after a crash"""
+        return np.fromfile(stream_file, dtype=EVENT_DTYPE)
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 22:41:18 2026
+
+Per-frame stimulus state: what was on screen at every frame (time, trial,
+checkerboard texture, bar position, orientation and direction, fixation dot
+color). Rows are written into a preallocated structured array that is a
+memory-mapped .npy file (<output_str>_StimulusLog.npy), so recording a frame is
+one row assignment, and the frames recorded before a crash are already in the
+file. Rows that were never written have frame -1.
+
+To check the stimulus log of a run, run from within the Experiment folder:
+    python framelog.py ./logs/sub-001_ses-1_task-1R_run-1_Logs/sub-001_ses-1_task-1R_run-1_StimulusLog.npy
+"""
+
+import argparse
+
+import numpy as np
+
+
+STATE_DTYPE = np.dtype([('frame', np.int64),
+                        ('time', np.float64),
+                        ('trial_nr', np.int32),
+                        ('texture_index', np.int8),
+                        ('bar_x', np.float32),
+                        ('bar_y', np.float32),
+                        ('bar_orientation', np.float32),
+                        ('bar_direction', np.int8),
+                        ('dot_color', np.int8)])
+
+
+def capacity_for(run_duration, frame_period, margin=1.5):
+    """number of rows for a run of run_duration seconds, with a margin for runs that last longer (e.g. waiting for pulses)"""
+    return int(np.ceil(margin*run_duration/frame_period)) + 600
+
+
+class StimulusLog(object):
+
+    def __init__(self, filename, capacity):
+        self.filename = filename
+        #the whole file is allocated (and marked unwritten) before the run, so the frame loop never resizes it
+        self.states = np.lib.format.open_memmap(filename, mode='w+', dtype=STATE_DTYPE, shape=(capacity,))
+        self.states['frame'] = -1
+        self.capacity = capacity
+        self.nr_frames = 0
+        self.nr_dropped = 0
+
+    def __len__(self):
+        return min(self.nr_frames, self.capacity)
+
+    def record(self, time, trial_nr, texture_index, bar_pos, bar_orientation, bar_direction, dot_color):
+        if self.nr_frames < self.capacity:
+            self.states[self.nr_frames] = (self.nr_frames, time, trial_nr, texture_index,
+                                           bar_pos[0], bar_pos[1], bar_orientation, bar_direction, dot_color)
+        else:
+            self.nr_dropped += 1
+        self.nr_frames += 1
+
+    def close(self):
+        if self.states is None:
+            return
+        self.states.flush()
+        self.states = None
+        if self.nr_dropped:
+            print("Stimulus log full: %d of %d frames were not logged"%(self.nr_dropped, self.nr_frames))
+
+
+def nr_logged(states):
+    """number of written rows. rows are written in order, so this is a binary search on the frame column"""
+    low, high = 0, len(states)
+    while low < high:
+        middle = (low+high)//2
+        if states['frame'][middle] >= 0:
+            low = middle+1
+        else:
+            high = middle
+    return low
+
+
+def load_states(filename):
+    """logged frames, as a read-only view of the file (nothing is read until it is accessed)"""
+    states = np.load(filename, mmap_mode='r')
+    return states[:nr_logged(states)]
+
+
+def dot_switch_times(states):
+    """times of the frames on which the fixation dot changed color"""
+    return states['time'][1:][np.diff(states['dot_color']) != 0]
+
+
+def summary(states):
+    trials, frames_per_trial = np.unique(states['trial_nr'], return_counts=True)
+    textures, frames_per_texture = np.unique(states['texture_index'], return_counts=True)
+    return {'Frames':len(states),
+            'Trials':len(trials),
+            'Frames per trial (min, max)':(int(frames_per_trial.min()), int(frames_per_trial.max())) if len(trials) else (0, 0),
+            'Blank frames':int(np.sum(states['texture_index'] == -1)),
+            'Frames per texture':{int(t):int(n) for t, n in zip(textures, frames_per_texture) if t >= 0},
+            'Dot color switches':len(dot_switch_times(states))}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize the per-frame stimulus log of a run")
+    parser.add_argument('stimulus_log')
+    parser.add_argument('--dot-switch-times', default=None,
+                        help="*_DotSwitchColorTimes.npy of the run, to compare with the logged dot switches")
+    args = parser.parse_args(argv)
+
+    states = load_states(args.stimulus_log)
+    for name, value in summary(states).items():
+        print(f"{name}: {value}")
+
+    if args.dot_switch_times is not None:
+        planned = np.load(args.dot_switch_times)
+        logged = dot_switch_times(states)
+        planned = planned[planned <= states['time'][-1]] if len(states) else planned[:0]
+        if len(planned) == len(logged):
+            print("Dot switch delay (ms): max %.2f"%(1000*np.max(logged-planned, initial=0)))
+        else:
+            print("Dot switches: %d planned, %d logged"%(len(planned), len(logged)))
+
+
+if __name__ == '__main__':
+    main()
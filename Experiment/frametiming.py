@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 14:01:44 2026
+
+Per-frame timing of the frame loop: draw start, draw end and flip time of each
+frame, the checkerboard drawn, and the latency from a scanner pulse to the next flip.
+Timestamps go into a preallocated ring buffer (one array per column), which is
+saved as a structured .npy at the end of the run and summarized.
+"""
+
+import numpy as np
+
+
+FRAME_DTYPE = np.dtype([('frame', np.int64),
+                        ('trial_nr', np.int32),
+                        ('texture_index', np.int8),
+                        ('draw_start', np.float64),
+                        ('draw_end', np.float64),
+                        ('flip', np.float64),
+                        ('trigger_to_flip', np.float64)])
+
+
+class FrameTimer(object):
+
+    def __init__(self, clock, capacity=2**17):
+        self.clock = clock
+        self.capacity = capacity
+        #one preallocated array per column: assigning scalars into these is cheap
+        self.trial_nr = np.full(capacity, -1, dtype=np.int32)
+        self.texture_index = np.full(capacity, -1, dtype=np.int8)
+        self.draw_start = np.full(capacity, np.nan)
+        self.draw_end = np.full(capacity, np.nan)
+        self.flip = np.full(capacity, np.nan)
+        self.trigger_to_flip = np.full(capacity, np.nan)
+
+        self.nr_frames = 0
+        self._slot = 0
+        self._pending_trigger = None
+
+    def start_frame(self, trial_nr):
+        self._slot = self.nr_frames % self.capacity
+        self.trial_nr[self._slot] = trial_nr
+        self.draw_start[self._slot] = self.clock.getTime()
+
+    def end_draw(self, texture_index=-1):
+        self.draw_end[self._slot] = self.clock.getTime()
+        self.texture_index[self._slot] = texture_index
+
+    def flipped(self):
+        """to be called right after the flip (win.callOnFlip)"""
+        t = self.clock.getTime()
+        self.flip[self._slot] = t
+        self.trigger_to_flip[self._slot] = np.nan
+
+        #the first flip after a pulse shows the new bar position
+        if self._pending_trigger is not None:
+            self.trigger_to_flip[self._slot] = t-self._pending_trigger
+            self._pending_trigger = None
+
+        self.nr_frames += 1
+
+    def trigger(self, t):
+        """a scanner pulse, at time t, moved the bar"""
+        self._pending_trigger = t
+
+    def frames(self):
+        """logged frames, oldest first, as a structured array"""
+        nr_logged = min(self.nr_frames, self.capacity)
+        order = (np.arange(self.nr_frames-nr_logged, self.nr_frames)) % self.capacity
+
+        frames = np.zeros(nr_logged, dtype=FRAME_DTYPE)
+        frames['frame'] = np.arange(self.nr_frames-nr_logged, self.nr_frames)
+        for column in FRAME_DTYPE.names[1:]:
+            frames[column] = getattr(self, column)[order]
+        return frames
+
+    def save(self, filename):
+        np.save(filename, self.frames())
+
+    def summary(self, frame_period=None, nr_worst_trials=5):
+        frames = self.frames()
+        if len(frames) < 2:
+            return {'Frames':len(frames)}
+
+        flip_intervals = np.diff(frames['flip'])
+        if frame_period is None:
+            frame_period = np.nanmedian(flip_intervals)
+
+        #a flip more than 1.5 frames after the previous one means at least one frame was dropped
+        dropped = np.zeros(len(frames), dtype=int)
+        dropped[1:] = np.maximum(np.round(np.nan_to_num(flip_intervals)/frame_period).astype(int)-1, 0)
+
+        draw_times = 1000*(frames['draw_end']-frames['draw_start'])
+        latencies = 1000*frames['trigger_to_flip'][np.isfinite(frames['trigger_to_flip'])]
+
+        trials, trial_idx = np.unique(frames['trial_nr'], return_inverse=True)
+        dropped_per_trial = np.bincount(trial_idx, weights=dropped, minlength=len(trials))
+        max_draw_per_trial = np.full(len(trials), -np.inf)
+        np.maximum.at(max_draw_per_trial, trial_idx, np.nan_to_num(draw_times))
+        worst = np.lexsort((-max_draw_per_trial, -dropped_per_trial))[:nr_worst_trials]
+
+        percentiles = [50, 95, 99, 100]
+        return {'Frames':len(frames),
+                'Frame period (ms)':1000*frame_period,
+                'Dropped frames':int(dropped.sum()),
+                'Draw time percentiles (ms)':dict(zip(percentiles, np.nanpercentile(draw_times, percentiles))),
+                'Trigger to flip percentiles (ms)':dict(zip(percentiles, np.percentile(latencies, percentiles))) if len(latencies) else {},
+                'Worst trials':[{'trial_nr':int(trials[i]),
+                                 'dropped frames':int(dropped_per_trial[i]),
+                                 'max draw time (ms)':float(max_draw_per_trial[i])} for i in worst]}
+
+
+def print_summary(summary):
+    print(f"Frames: {summary['Frames']}")
+    if 'Dropped frames' not in summary:
+        return
+    print(f"Dropped frames: {summary['Dropped frames']} (frame period {summary['Frame period (ms)']:.2f} ms)")
+    print("Draw time (ms): "+", ".join(f"p{p} {v:.2f}" for p, v in summary['Draw time percentiles (ms)'].items()))
+    if summary['Trigger to flip percentiles (ms)']:
+        print("Trigger to flip (ms): "+", ".join(f"p{p} {v:.2f}" for p, v in summary['Trigger to flip percentiles (ms)'].items()))
+    for trial in summary['Worst trials']:
+        print(f"  trial {trial['trial_nr']}: {trial['dropped frames']} dropped frames, max draw time {trial['max draw time (ms)']:.2f} ms")
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 01:52:36 2026
+
+Sessions of the dry run (dryrun.py): the exptools2 Session without a display,
+and PRFSession on top of it. Session.__init__ cannot run without a display (it
+opens the window and creates a mouse and a TextStim), so HeadlessSession does
+not call it: the attributes that the run uses are set up by dryrun.HeadlessSetup,
+with the null window and the virtual clocks of dryrun.py, and the exptools2
+methods that do not need a display (settings, monitor, log file).
+
+exptools2 imports psychopy.visual, which imports pyglet.gl. pyglet creates a
+hidden shadow window when pyglet.gl is imported, unless told not to, so this
+module turns it off before the first psychopy import. Run from within the
+Experiment folder (see dryrun.py):
+    python dryrun.py expsettings_1R.yml
+"""
+
+import dataclasses
+
+import numpy as np
+import pyglet
+
+#no window is ever opened in a dry run, and a headless computer has no display for pyglet's shadow window
+pyglet.options['shadow_window'] = False
+
+from exptools2.core.session import Session
+from session import PRFSession
+from dryrun import HeadlessSetup, NullStim, scripted_keys
+
+
+class HeadlessSession(HeadlessSetup, Session):
+    """the exptools2 Session on virtual clocks and a null window"""
+
+
+class DryRunSession(PRFSession, HeadlessSession):
+    """PRFSession on a virtual clock, fed a scripted key stream (see dryrun.scripted_keys)"""
+
+    #the pulses are part of the scripted key stream, on the virtual clock: no keyboard is read, and no pulses or metrics are sent.
+    #nothing is drawn, so screenshots would only be blank frames
+    dry_run_settings = dict(trigger_emulator=False, input_polling_rate=None, metrics_port=None, screenshot=False)
+
+    def __init__(self, output_str, output_dir, settings_file, plan_file=None, frame_rate=60.0, keys=None, seed=None,
+                 config_changes=None):
+        self.frame_rate = frame_rate
+        self.config_changes = dict(config_changes or {}, **self.dry_run_settings)
+        super().__init__(output_str=output_str, output_dir=output_dir, settings_file=settings_file, plan_file=plan_file)
+
+        if keys is None:
+            keys = scripted_keys(self.config, self.trial_number, self.dot_switch_color_times, rng=np.random.default_rng(seed))
+        self.scripted_keys, self.scripted_key_times = keys
+        self._next_key = 0
+
+    def _load_config(self, settings_file):
+        return dataclasses.replace(super()._load_config(settings_file), **self.config_changes)
+
+    def create_stimuli(self):
+        self.prf_stim = NullStim()
+        self.mask_stim = NullStim()
+        self.fixation_disks = [NullStim(), NullStim()]
+
+    def get_keys(self):
+        """scripted keys up to the current (virtual) time"""
+        last_key = int(np.searchsorted(self.scripted_key_times, self.clock.getTime(), side='right'))
+        keys = list(zip(self.scripted_keys[self._next_key:last_key].tolist(),
+                        self.scripted_key_times[self._next_key:last_key].tolist()))
+        self._next_key = max(last_key, self._next_key)
+        return keys
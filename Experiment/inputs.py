@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 20:11:53 2026
+
+Keyboard and button box input, polled on a background thread at a fixed rate
+(e.g. 1 kHz) instead of once per frame. Each key is timestamped on the
+session clock when it is detected (or with the device timestamp, if the source
+has one) and appended to a deque, which the frame loop drains in get_events.
+Appending to and popping from a deque are atomic, so no lock is needed.
+Enable it in the settings file under "Task settings:", as "input polling rate: 1000".
+Polling the keyboard from a thread needs the psychtoolbox backend of
+psychopy.hardware.keyboard, and has not been checked on the scanner computer yet.
+
+To check the timestamp accuracy with a scripted input source, run from within the Experiment folder:
+    python inputs.py --rate 1000 --events 500
+"""
+
+import argparse
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+
+class PerfCounterClock(object):
+    """minimal psychopy-like clock on time.perf_counter, for testing without psychopy"""
+
+    def __init__(self):
+        self._time_at_last_reset = time.perf_counter()
+
+    def getTime(self):
+        return time.perf_counter()-self._time_at_last_reset
+
+    def reset(self, newT=0.0):
+        self._time_at_last_reset = time.perf_counter()+newT
+
+
+class KeyboardSource(object):
+    """keys from psychopy.hardware.keyboard (psychtoolbox backend), with their device timestamps on the given clock"""
+
+    def __init__(self, clock):
+        from psychopy.hardware import keyboard
+        self.keyboard = keyboard.Keyboard(clock=clock)
+        #the other backends are not safe to poll from a thread: the event backend calls event.getKeys, which belongs
+        #to the main thread (window events), and returns at most one key per call
+        if keyboard.Keyboard.getBackend() != 'ptb':
+            raise RuntimeError(f"'input polling rate' needs the psychtoolbox keyboard backend, but psychopy uses "
+                               f"'{keyboard.Keyboard.getBackend()}'. Install psychtoolbox, or leave 'input polling rate' empty")
+
+    def poll(self):
+        #rt is the device timestamp relative to the last reset of the clock, on every backend (tDown is not on the clock)
+        return [(key.name, key.rt) for key in self.keyboard.getKeys(waitRelease=False, clear=True)]
+
+
+class ScriptedSource(object):
+    """keys that become available at given times on the clock, without a timestamp (so the poller timestamps them)"""
+
+    def __init__(self, keys, times, clock):
+        order = np.argsort(times, kind='stable')
+        self.keys = np.asarray(keys, dtype=object)[order].tolist()
+        self.times = np.asarray(times, dtype=float)[order]
+        self.clock = clock
+        self._next_key = 0
+
+    def poll(self):
+        last_key = int(np.searchsorted(self.times, self.clock.getTime(), side='right'))
+        keys = [(key, None) for key in self.keys[self._next_key:last_key]]
+        self._next_key = max(last_key, self._next_key)
+        return keys
+
+
+class InputPoller(threading.Thread):
+
+    def __init__(self, clock, source=None, rate=1000.0):
+        super().__init__(daemon=True)
+        self.clock = clock
+        self.source = source
+        self.period = 1.0/rate
+
+        self.events = deque()
+        self.nr_polls = 0
+        self._stop_event = threading.Event()
+
+    def start(self):
+        #the keyboard is opened on the main thread
+        if self.source is None:
+            self.source = KeyboardSource(self.clock)
+        #keys from before polling starts (e.g. while waiting for the scanner) are not logged
+        self.source.poll()
+        super().start()
+
+    def run(self):
+        next_poll = time.perf_counter()
+        while not self._stop_event.is_set():
+            for key, t in self.source.poll():
+                self.push(key, t)
+            self.nr_polls += 1
+
+            #absolute deadlines, so that a slow poll does not lower the rate
+            next_poll += self.period
+            delay = next_poll-time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_poll = time.perf_counter()
+
+    def push(self, key, t=None):
+        """add a key, timestamped now on the session clock unless t is given. also used by the trigger emulator"""
+        self.events.append((key, self.clock.getTime() if t is None else t))
+
+    def drain(self):
+        """all keys since the last call, as (key, time) like event.getKeys(timeStamped=clock)"""
+        keys = []
+        while True:
+            try:
+                keys.append(self.events.popleft())
+            except IndexError:
+                return keys
+
+    def stop(self):
+        self._stop_event.set()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join()
+
+
+def measure_timing(rate=1000.0, nr_events=500, interval=0.01, jitter=0.005, seed=0):
+    """errors (s) of the polled timestamps of a scripted key stream, and the achieved polling rate"""
+    rng = np.random.default_rng(seed)
+    times = 0.1+np.cumsum(interval+jitter*rng.random(nr_events))
+
+    clock = PerfCounterClock()
+    poller = InputPoller(clock, ScriptedSource(['b']*nr_events, times, clock), rate=rate)
+    poller.start()
+    time.sleep(times[-1]+0.05)
+    poller.stop()
+
+    recorded = np.array([t for _, t in poller.drain()])
+    return recorded-times[:len(recorded)], poller.nr_polls/clock.getTime()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Timestamp accuracy of the input polling thread, with scripted keys")
+    parser.add_argument('--rate', type=float, default=1000.0, help="polling rate (Hz)")
+    parser.add_argument('--events', type=int, default=500)
+    parser.add_argument('--interval', type=float, default=0.01, help="mean time between keys (s)")
+    args = parser.parse_args(argv)
+
+    errors, achieved_rate = measure_timing(args.rate, args.events, args.interval)
+    percentiles = [50, 95, 99, 100]
+    print(f"Keys: {len(errors)}/{args.events}, polling rate {achieved_rate:.0f} Hz")
+    print("Timestamp error (ms): "+", ".join(f"p{p} {v:.3f}" for p, v in zip(percentiles, 1000*np.percentile(errors, percentiles))))
+
+
+if __name__ == '__main__':
+    main()
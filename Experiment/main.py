@@ -7,11 +7,45 @@ Created on Mon Feb 25 14:04:44 2019
 """
 import sys
 import os
-from session import PRFSession
 from datetime import datetime
 datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
+def run_paths(subject, sess, task, run):
+    """output string, output directory and settings file of one run"""
+    output_str= subject+'_'+sess+'_'+task+'_'+run
+    
+    output_dir = './logs/'+output_str+'_Logs'
+    
+    if os.path.exists(output_dir):
+        print("Warning: output directory already exists. Renaming to avoid overwriting.")
+        output_dir = output_dir + datetime.now().strftime('%Y%m%d%H%M%S')
+    
+    settings_file='./expsettings_'+task[5:]+'.yml'
+    
+    return output_str, output_dir, settings_file
+
 def main():
+    #run plans for a whole study can be created without psychopy: python main.py plan --subjects ... (see plan.py)
+    if sys.argv[1] == 'plan':
+        from plan import main as plan_main
+        plan_main(sys.argv[2:])
+        return
+    
+    #whole sessions on a virtual clock, without a display: python main.py dryrun expsettings_1R.yml ... (see dryrun.py)
+    if sys.argv[1] == 'dryrun':
+        from dryrun import main as dryrun_main
+        dryrun_main(sys.argv[2:])
+        return
+    
+    #several runs of one session in the same window: python main.py session sub-001 ses-1 --runs task-1R:run-1 ... (see runs.py)
+    if sys.argv[1] == 'session':
+        from runs import main as runs_main
+        runs_main(sys.argv[2:])
+        return
+    
+    #psychopy is only imported to actually run the experiment
+    from session import PRFSession
+    
     subject = sys.argv[1]
     sess =  sys.argv[2]
     # 5 conditions: PRF2R, PRF1R, PRF1S, PRF4R, PRF4F 
@@ -19,19 +53,16 @@ def main():
     task = sys.argv[3]
     #in the full experiment we would do 3 runs
     run = sys.argv[4]
+    #optionally, a run plan created in advance
+    if len(sys.argv) > 5:
+        plan_file = sys.argv[5]
+    else:
+        plan_file = None
     
     
-    output_str= subject+'_'+sess+'_'+task+'_'+run
-    
-    output_dir = './logs/'+output_str+'_Logs'
-    
-    if os.path.exists(output_dir):
-        print("Warning: output directory already exists. Renaming to avoid overwriting.")
-        output_dir = output_dir + datetime.now().strftime('%Y%m%d%H%M%S')
-    
-    settings_file='./expsettings_'+task[5:]+'.yml'
+    output_str, output_dir, settings_file = run_paths(subject, sess, task, run)
 
-    ts = PRFSession(output_str=output_str, output_dir=output_dir, settings_file=settings_file)
+    ts = PRFSession(output_str=output_str, output_dir=output_dir, settings_file=settings_file, plan_file=plan_file)
     ts.run()
 
 if __name__ == '__main__':
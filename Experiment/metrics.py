@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 23:02:40 2026
+
+Live metrics for the operator console. A background thread takes a snapshot of
+the running session a few times per second (current trial, pulses received
+versus expected TRs, responses, hits and false alarms on the dot switches so
+far, recent frame intervals and dropped frames) and sends it as one JSON
+datagram over UDP to localhost. Sending a datagram never waits for a listener,
+and the snapshot only reads the session's logs, so the frame loop is not
+disturbed. Enable it in the settings file under "Task settings:", as
+"metrics port: 5005".
+
+To follow a run, in a second terminal, run from within the Experiment folder:
+    python metrics.py --port 5005
+"""
+
+import argparse
+import json
+import socket
+import threading
+import time
+
+import numpy as np
+
+from eventlog import EVENT_CODES
+from scoring import score_run
+
+
+HOST = '127.0.0.1'
+
+
+class SessionMetrics(object):
+    """snapshots of a PRFSession. dropped frames are counted incrementally, from the frames logged since the last snapshot"""
+
+    def __init__(self, session, recent_frames=120):
+        self.session = session
+        self.recent_frames = recent_frames
+        self.nr_dropped = 0
+        self._nr_counted = 0
+        self._frame_period = getattr(session.win, 'monitorFramePeriod', None) or 1/60.0
+
+    def _flip_times(self, start, stop):
+        frame_timer = self.session.frame_timer
+        start = max(start, stop-frame_timer.capacity)
+        return frame_timer.flip[np.arange(start, stop) % frame_timer.capacity]
+
+    def snapshot(self):
+        session = self.session
+        now = session.clock.getTime()
+
+        #the frame loop keeps appending while this runs, so the number of frames and events is read once
+        nr_frames = session.frame_timer.nr_frames
+        new_intervals = np.diff(self._flip_times(self._nr_counted-1 if self._nr_counted else 0, nr_frames))
+        self.nr_dropped += int(np.sum(np.maximum(np.round(np.nan_to_num(new_intervals)/self._frame_period)-1, 0)))
+        self._nr_counted = nr_frames
+        recent_intervals = 1000*np.diff(self._flip_times(nr_frames-self.recent_frames, nr_frames))
+        recent_intervals = recent_intervals[np.isfinite(recent_intervals)]
+
+        recorder = session.event_recorder
+        events = recorder.events[:len(recorder)]
+        pulses = int(np.sum(events['event_type'] == EVENT_CODES['pulse']))
+        responses = events['onset'][events['event_type'] == EVENT_CODES['response']]
+
+        #only the dot switches so far, so that switches still to come are not counted as misses
+        switches = session.dot_switch_color_times[session.dot_switch_color_times < now]
+        scores, _ = score_run(responses, switches, session.config.response_interval, run_duration=now)
+
+        current_trial = getattr(session, 'current_trial', None)
+        return {'time':now,
+                'trial':None if current_trial is None else current_trial.ID,
+                'expected_trs':session.trial_number,
+                'pulses':pulses,
+                'dot_count':scores['switches'],
+                'total_responses':scores['responses'],
+                'correct_responses':scores['hits'],
+                'false_alarms':scores['false_alarms'],
+                'frames':nr_frames,
+                'dropped_frames':self.nr_dropped,
+                'recent_frame_ms':{'median':float(np.median(recent_intervals)) if len(recent_intervals) else None,
+                                   'max':float(np.max(recent_intervals)) if len(recent_intervals) else None}}
+
+
+class MetricsPublisher(threading.Thread):
+
+    def __init__(self, snapshot, port, host=HOST, rate=4.0):
+        super().__init__(daemon=True)
+        self.snapshot = snapshot
+        self.address = (host, port)
+        self.period = 1.0/rate
+        self.nr_sent = 0
+        self.nr_failed = 0
+        self._stop_event = threading.Event()
+
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.setblocking(False)
+
+    def publish(self):
+        try:
+            self.socket.sendto(json.dumps(self.snapshot()).encode(), self.address)
+            self.nr_sent += 1
+        except Exception:
+            #no listener (connection refused), a full socket buffer or a failed snapshot: skip this one.
+            #the metrics must never stop the publisher thread or the close of the session
+            self.nr_failed += 1
+
+    def run(self):
+        next_time = time.perf_counter()
+        while not self._stop_event.is_set():
+            self.publish()
+            next_time += self.period
+            self._stop_event.wait(max(next_time-time.perf_counter(), 0))
+
+    def stop(self):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join()
+        #a last snapshot, with the final counts
+        self.publish()
+        self.socket.close()
+
+
+def receive(port, host=HOST, timeout=None):
+    """snapshots sent to this port, as they arrive. stops after timeout seconds without a snapshot"""
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.bind((host, port))
+        sock.settimeout(timeout)
+        while True:
+            try:
+                data, _ = sock.recvfrom(65536)
+            except socket.timeout:
+                return
+            yield json.loads(data)
+
+
+def format_snapshot(snapshot):
+    frame_ms = snapshot['recent_frame_ms']
+    accuracy = 100*snapshot['correct_responses']/snapshot['dot_count'] if snapshot['dot_count'] else 0
+    return (f"{snapshot['time']:7.1f}s  trial {snapshot['trial']}/{snapshot['expected_trs']}  "
+            f"pulses {snapshot['pulses']}  "
+            f"correct {snapshot['correct_responses']}/{snapshot['dot_count']} ({accuracy:.0f}%)  "
+            f"responses {snapshot['total_responses']}  false alarms {snapshot['false_alarms']}  "
+            f"dropped frames {snapshot['dropped_frames']}"+
+            (f"  frame {frame_ms['median']:.1f}/{frame_ms['max']:.1f} ms" if frame_ms['median'] is not None else ""))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Print the live metrics of a running session")
+    parser.add_argument('--port', type=int, default=5005)
+    parser.add_argument('--timeout', type=float, default=None, help="stop after this many seconds without metrics")
+    args = parser.parse_args(argv)
+
+    try:
+        for snapshot in receive(args.port, timeout=args.timeout):
+            print(format_snapshot(snapshot), flush=True)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
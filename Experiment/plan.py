@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 11:20:51 2026
+
+Run plan: everything the frame loop needs, precomputed once per run.
+This module only depends on numpy and yaml, so that plans can be built without psychopy.
+
+Plans for a whole study (subjects x sessions x tasks x runs) can be created in
+advance, with deterministic seeds, and loaded by PRFSession at startup:
+    python plan.py --subjects sub-001 sub-002 --sessions ses-1 --tasks task-1R task-2R --runs run-1 run-2
+    python main.py sub-001 ses-1 task-1R run-1 ./plans/sub-001_ses-1_task-1R_run-1_plan.npz
+"""
+
+import argparse
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+
+import numpy as np
+import yaml
+
+from config import PRFConfig
+
+opj = os.path.join
+
+
+#index (0-7, for checkerboard_1 to checkerboard_8) of the texture shown in each eighth of the flicker cycle.
+#bar moving up or down simply has reversed order of presentation
+PHASE_TO_TEXTURE = np.array([[0, 1, 2, 3, 4, 5, 6, 7],
+                             [7, 6, 5, 4, 3, 2, 1, 0]], dtype=np.int8)
+
+
+def load_settings(settings_file):
+    """settings dict from an expsettings_*.yml file"""
+    with open(settings_file) as f:
+        return yaml.safe_load(f)
+
+
+def load_config(settings_file):
+    """compiled settings (PRFConfig) of an expsettings_*.yml file"""
+    return PRFConfig.from_settings(load_settings(settings_file))
+
+
+def deg2pix(degrees, config):
+    """same conversion as psychopy.tools.monitorunittools.deg2pix, from the monitor and window settings"""
+    cm = degrees*config.monitor_distance*0.017455
+    return cm*config.win_size[0]/config.monitor_width
+
+
+def bar_sequence(config, win_height):
+    """number of trials (TRs), and bar orientation and position along that orientation at each TR"""
+    bar_orientations = np.array(config.bar_orientations)
+    is_blank = bar_orientations == -1
+
+    #create as many trials as TRs. 5 extra TRs at beginning + bar passes + blanks
+    #create bar orientation list at each TR (this can be done in many different ways according to necessity)
+    #for example, currently blank periods have same length as bar passes. this can easily be changed here
+    repeat_times = np.where(is_blank, config.blanks_length, config.bar_pass_steps)
+    trial_number = 5 + repeat_times.sum()
+
+    bar_orientation_at_TR = np.concatenate((-1*np.ones(5), np.repeat(bar_orientations, repeat_times)))
+
+    #calculation of positions depend on whether code is run on mac
+    if config.operating_system == 'mac':
+        bar_pos_array = (win_height/2)*np.linspace(-0.5,0.5, config.bar_pass_steps)
+    else:
+        bar_pos_array = win_height*np.linspace(-0.5,0.5, config.bar_pass_steps)
+
+    #bar position at TR: step within the current bar pass, or 0 during blanks (and the 5 empty trials at beginning)
+    block_starts = np.cumsum(repeat_times)-repeat_times
+    step_in_block = np.arange(trial_number-5) - np.repeat(block_starts, repeat_times)
+    bar_pos_in_ori = np.concatenate((np.zeros(5),
+                                     np.where(np.repeat(is_blank, repeat_times), 0.0, bar_pos_array.take(step_in_block, mode='clip'))))
+
+    return int(trial_number), bar_orientation_at_TR, bar_pos_in_ori
+
+
+TRIAL_DTYPE = np.dtype([('trial_nr', np.int32),
+                        ('bar_orientation', np.float64),
+                        ('bar_pos_in_ori', np.float64),
+                        ('bar_direction', np.int8),
+                        ('phase_duration', np.float64),
+                        ('topup', np.bool_)])
+
+
+def trial_table(config, bar_orientation_at_TR, bar_pos_in_ori, bar_direction_at_TR):
+    """all trials of a run, as one structured array"""
+    trials = np.zeros(len(bar_orientation_at_TR), dtype=TRIAL_DTYPE)
+    trials['trial_nr'] = np.arange(len(trials))
+    trials['bar_orientation'] = bar_orientation_at_TR
+    trials['bar_pos_in_ori'] = bar_pos_in_ori
+    trials['bar_direction'] = bar_direction_at_TR
+
+    #here we decide how to go from each trial (bar position) to the next.
+    if config.scanner_sync:
+        #dummy value: if scanning or simulating a scanner, everything is synced to the output 't' of the scanner
+        trials['phase_duration'] = 100
+    else:
+        #if not synced to a real or simulated scanner, take the bar pass step as length
+        trials['phase_duration'] = config.bar_step_length
+
+    #add topup time to last trial
+    if config.topup_scan:
+        trials['topup'][-1] = True
+        trials['phase_duration'][-1] = config.topup_duration
+
+    return trials
+
+
+def total_time(config, trial_number):
+    """duration of the run, including the topup scan"""
+    run_time = trial_number*config.trial_duration
+
+    if config.topup_scan:
+        run_time += config.topup_duration
+
+    return run_time
+
+
+def bar_directions(trial_number, rng=np.random):
+    """random bar direction at each step. could also make this time-based"""
+    return np.round(rng.random(trial_number))
+
+
+def dot_switch_times(config, trial_number, rng=np.random):
+    """times for dot color change. continue the task into the topup"""
+    dot_switch_color_times = np.arange(3, total_time(config, trial_number), config.color_switch_interval)
+    dot_switch_color_times += (2*rng.random(len(dot_switch_color_times))-1)
+    return dot_switch_color_times
+
+
+def plan_settings(config):
+    """the settings that a plan depends on, saved with it as settings_* arrays"""
+    return {'settings_operating_system':np.array(config.operating_system),
+            'settings_bar_orientations':np.array(config.bar_orientations, dtype=float),
+            'settings_bar_pass_steps':np.array(config.bar_pass_steps),
+            'settings_blanks_length':np.array(config.blanks_length),
+            #bar step length, or TR with scanner sync
+            'settings_trial_duration':np.array(config.trial_duration),
+            'settings_topup_duration':np.array(config.topup_duration if config.topup_scan else 0.0)}
+
+
+def check_plan(plan, config, filename='plan'):
+    """raises if the plan was created from other settings than config (e.g. another task, or another operating system)"""
+    expected = plan_settings(config)
+    missing = [key for key in expected if key not in plan]
+    if missing:
+        raise ValueError(f"{filename} does not list the settings it was created from. Create it again with plan.py")
+
+    mismatches = [f"{key[len('settings_'):]}: {plan[key].tolist()} in the plan, {value.tolist()} in the settings"
+                  for key, value in expected.items()
+                  if plan[key].shape != value.shape or
+                  not (np.array_equal(plan[key], value) if value.dtype.kind == 'U' else np.allclose(plan[key], value))]
+    if mismatches:
+        raise ValueError(f"{filename} was created from other settings than this session's: "+"; ".join(mismatches))
+
+
+def create_plan(config, win_height=None, rng=np.random):
+    """bar sequence, bar directions and dot switch times of one run"""
+    if win_height is None:
+        win_height = config.win_size[1]
+
+    trial_number, bar_orientation_at_TR, bar_pos_in_ori = bar_sequence(config, win_height=win_height)
+
+    return {'bar_orientation_at_TR':bar_orientation_at_TR,
+            'bar_pos_in_ori':bar_pos_in_ori,
+            'bar_direction_at_TR':bar_directions(trial_number, rng),
+            'dot_switch_color_times':dot_switch_times(config, trial_number, rng),
+            'win_height':np.array(win_height),
+            **plan_settings(config)}
+
+
+def save_plan(filename, plan):
+    np.savez(filename, **plan)
+
+
+def load_plan(filename, win_height=None, config=None):
+    """plan saved with save_plan. if config is given, the plan must have been created from the same settings (see check_plan).
+    bar positions are rescaled if the window height differs from the planned one"""
+    with np.load(filename) as f:
+        plan = {key:f[key] for key in f.files}
+
+    if config is not None:
+        check_plan(plan, config, filename)
+
+    if win_height is not None and win_height != plan['win_height']:
+        plan['bar_pos_in_ori'] = plan['bar_pos_in_ori']*win_height/plan['win_height']
+        plan['win_height'] = np.array(win_height)
+
+    return plan
+
+
+def settings_file_for_task(task, settings_dir='.'):
+    """settings file of a task, named as in main.py (task-1R uses expsettings_1R.yml)"""
+    return opj(settings_dir, 'expsettings_'+task[5:]+'.yml')
+
+
+def run_seed(output_str, study_seed=0):
+    """deterministic seed for one run, from the study seed and the run name"""
+    run_hash = int.from_bytes(hashlib.sha256(output_str.encode()).digest()[:8], 'little')
+    return np.random.SeedSequence([study_seed, run_hash])
+
+
+def _create_run_plan(output_str, settings_file, output_file, seed):
+    plan = create_plan(load_config(settings_file), rng=np.random.default_rng(seed))
+    save_plan(output_file, plan)
+    return output_file
+
+
+def create_study_plans(subjects, sessions, tasks, runs, output_dir='./plans', settings_dir='.', study_seed=0, n_workers=None):
+    """plan files for every subject x session x task x run, created in parallel"""
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        futures = []
+        for subject, sess, task, run in product(subjects, sessions, tasks, runs):
+            #same naming as main.py
+            output_str = subject+'_'+sess+'_'+task+'_'+run
+            futures.append(pool.submit(_create_run_plan,
+                                       output_str,
+                                       settings_file_for_task(task, settings_dir),
+                                       opj(output_dir, output_str+'_plan.npz'),
+                                       run_seed(output_str, study_seed)))
+
+        return [future.result() for future in futures]
+
+
+def bar_xy(bar_orientation, bar_pos_in_ori):
+    """position of the bar in the window, from its orientation (degrees) and position along that orientation"""
+    angle = (2.0*np.pi)*-np.asarray(bar_orientation, dtype=float)/360.0
+    return np.cos(angle)*bar_pos_in_ori, np.sin(angle)*bar_pos_in_ori
+
+
+def flicker_phase(time, flicker_frequency):
+    """eighth of the flicker cycle (0-7) at the given time(s)"""
+    return np.floor(8*np.asarray(time)*flicker_frequency).astype(int) % 8
+
+
+def dot_color(time, dot_switch_color_times):
+    """index of the fixation disk shown at the given time(s): 1 before the first switch, then alternating"""
+    return (np.searchsorted(dot_switch_color_times, time, side='right') + 1) % 2
+
+
+class RunPlan(object):
+    """per-trial bar position, texture lookup table and dot color timeline of one run"""
+
+    def __init__(self, bar_orientation_at_TR, bar_pos_in_ori, bar_direction_at_TR, dot_switch_color_times, flicker_frequency):
+        self.bar_orientation = np.asarray(bar_orientation_at_TR, dtype=float)
+        self.bar_visible = self.bar_orientation != -1
+
+        x, y = bar_xy(self.bar_orientation, bar_pos_in_ori)
+        self.bar_pos = np.stack([x, y], axis=1)
+
+        #for each trial, the texture to draw in each eighth of the flicker cycle
+        self.texture_lut = PHASE_TO_TEXTURE[np.asarray(bar_direction_at_TR, dtype=int)]
+
+        self.dot_switch_color_times = np.asarray(dot_switch_color_times, dtype=float)
+        self.flicker_frequency = flicker_frequency
+
+        #kept as python scalars/lists: indexing those is cheaper than numpy scalar arithmetic in the frame loop
+        self._phases_per_second = 8.0*flicker_frequency
+        self._bar_visible = self.bar_visible.tolist()
+        self._bar_pos = self.bar_pos.tolist()
+        self._bar_orientation = self.bar_orientation.tolist()
+        self._texture_lut = self.texture_lut.tolist()
+
+    def __len__(self):
+        return len(self.bar_orientation)
+
+    def texture_index(self, trial_nr, time):
+        return self._texture_lut[trial_nr][int(time*self._phases_per_second) % 8]
+
+    def dot_color(self, time):
+        return (int(self.dot_switch_color_times.searchsorted(time, side='right')) + 1) % 2
+
+    def frame(self, trial_nr, time):
+        """(visible, texture index, bar position, bar orientation, dot color) to draw at this time"""
+        return (self._bar_visible[trial_nr],
+                self.texture_index(trial_nr, time),
+                self._bar_pos[trial_nr],
+                self._bar_orientation[trial_nr],
+                self.dot_color(time))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Create run plans for a whole study, without opening a window")
+    parser.add_argument('--subjects', nargs='+', required=True)
+    parser.add_argument('--sessions', nargs='+', required=True)
+    parser.add_argument('--tasks', nargs='+', required=True, help="e.g. task-1R. the settings file is expsettings_1R.yml")
+    parser.add_argument('--runs', nargs='+', required=True)
+    parser.add_argument('--output-dir', default='./plans')
+    parser.add_argument('--settings-dir', default='.')
+    parser.add_argument('--seed', type=int, default=0, help="study seed. the same seed always gives the same plans")
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    plan_files = create_study_plans(args.subjects, args.sessions, args.tasks, args.runs,
+                                    args.output_dir, args.settings_dir, args.seed, args.workers)
+    print("Saved %d plans in %s"%(len(plan_files), args.output_dir))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 00:05:27 2026
+
+Sampling profiler for whole runs, cheap enough to leave on while scanning. A
+background thread takes the stack of the session thread every few ms
+(sys._current_frames), and stores the id of the stack and the time of each
+sample. Garbage collections are timed with gc.callbacks, and samples taken
+during a collection get a [gc] frame on top. The number of allocated memory
+blocks is read at each sample, for the allocation peak.
+
+The sampling thread needs the GIL, so samples are taken where the session
+thread releases it: in blocking calls (flip, sleep, file writes), in numpy, and
+every switch interval (5 ms) in pure python code.
+
+Output, next to the other logs of the run:
+- <output_str>_<name>_profile.collapsed: one "frame;frame;frame count" line per stack,
+  for flamegraph.pl, speedscope or inferno
+- <output_str>_<name>_profile.txt: hottest functions (own and total samples), the
+  same during slow frames (from the frame timing log), GC pauses, allocation peak
+- <output_str>_<name>_profile.npz: sample times and stacks, to relate them to other logs
+
+Enable it in the settings file under "profiling:", as "profile run: True".
+To print the report of a saved profile again, with slow frames from a frame timing log,
+run from within the Experiment folder:
+    python profiler.py ./logs/sub-001_ses-1_task-1R_run-1_Logs/sub-001_ses-1_task-1R_run-1_run_profile.npz --frames ./logs/sub-001_ses-1_task-1R_run-1_Logs/sub-001_ses-1_task-1R_run-1_FrameTiming.npy
+"""
+
+import argparse
+import gc
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+
+
+GC_FRAME = '[gc]'
+
+
+def _label(code):
+    return "%s:%s"%(os.path.basename(code.co_filename), code.co_name)
+
+
+class SamplingProfiler(threading.Thread):
+
+    def __init__(self, interval=0.005, clock=None):
+        super().__init__(daemon=True)
+        self.interval = interval
+        #sample times are on this clock (e.g. the session clock), so that they can be matched with the frame timing
+        self.get_time = time.perf_counter if clock is None else clock.getTime
+
+        self.sample_times = []
+        self.sample_stacks = []
+        self.gc_pauses = []
+        self.peak_blocks = 0
+        self.peak_blocks_time = np.nan
+        self.sampling_time = 0.0
+        self._stack_ids = {}
+        self._gc_start = None
+        self._target = None
+        self._stop_event = threading.Event()
+
+    def start(self):
+        """samples the thread that calls start"""
+        self._target = threading.get_ident()
+        self._start_time = time.perf_counter()
+        gc.callbacks.append(self._gc_callback)
+        super().start()
+
+    def _gc_callback(self, phase, info):
+        if phase == 'start':
+            self._gc_start = time.perf_counter()
+        elif self._gc_start is not None:
+            self.gc_pauses.append((info['generation'], time.perf_counter()-self._gc_start, info['collected']))
+            self._gc_start = None
+
+    def sample(self):
+        t0 = time.perf_counter()
+        frame = sys._current_frames().get(self._target)
+        if frame is None:
+            return
+
+        stack = []
+        while frame is not None:
+            stack.append(frame.f_code)
+            frame = frame.f_back
+        #root first, as in collapsed stacks
+        stack = tuple(reversed(stack))
+        if self._gc_start is not None:
+            stack += (GC_FRAME,)
+
+        self.sample_times.append(self.get_time())
+        self.sample_stacks.append(self._stack_ids.setdefault(stack, len(self._stack_ids)))
+
+        blocks = sys.getallocatedblocks()
+        if blocks > self.peak_blocks:
+            self.peak_blocks = blocks
+            self.peak_blocks_time = self.sample_times[-1]
+
+        self.sampling_time += time.perf_counter()-t0
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.sample()
+
+    def stop(self):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join()
+        if self._gc_callback in gc.callbacks:
+            gc.callbacks.remove(self._gc_callback)
+        self.duration = time.perf_counter()-self._start_time
+
+    def stacks(self):
+        """stacks (root first), as lists of 'file:function' labels, in order of stack id"""
+        stacks = [None]*len(self._stack_ids)
+        for stack, stack_id in self._stack_ids.items():
+            stacks[stack_id] = [frame if frame == GC_FRAME else _label(frame) for frame in stack]
+        return stacks
+
+    def save(self, prefix, frames=None):
+        """<prefix>_profile.collapsed, .npz and .txt. returns the report, with the slow frames if the frame timing is given"""
+        stacks = self.stacks()
+        counts = np.bincount(np.array(self.sample_stacks, dtype=np.int32), minlength=len(stacks))
+        with open(prefix+'_profile.collapsed', 'w') as f:
+            for stack, count in zip(stacks, counts):
+                f.write("%s %d\n"%(';'.join(stack), count))
+
+        gc_pauses = np.array(self.gc_pauses, dtype=float).reshape(-1, 3)
+        np.savez(prefix+'_profile.npz',
+                 sample_times=np.array(self.sample_times, dtype=float),
+                 sample_stacks=np.array(self.sample_stacks, dtype=np.int32),
+                 stacks=np.array([';'.join(stack) for stack in stacks], dtype=str),
+                 gc_generation=gc_pauses[:, 0].astype(np.int8),
+                 gc_pause=gc_pauses[:, 1],
+                 gc_collected=gc_pauses[:, 2].astype(np.int64),
+                 peak_blocks=self.peak_blocks,
+                 peak_blocks_time=self.peak_blocks_time,
+                 interval=self.interval,
+                 duration=self.duration,
+                 sampling_time=self.sampling_time)
+
+        report = format_report(load_profile(prefix+'_profile.npz'), frames)
+        with open(prefix+'_profile.txt', 'w') as f:
+            f.write(report)
+        return report
+
+
+def load_profile(filename):
+    with np.load(filename, allow_pickle=False) as f:
+        profile = {name:f[name] for name in f.files}
+    profile['stacks'] = [stack.split(';') for stack in profile['stacks'].tolist()]
+    return profile
+
+
+def hot_functions(stacks, stack_ids):
+    """own (leaf) and total (anywhere in the stack) samples of every function, over the given samples"""
+    samples_per_stack = np.bincount(stack_ids, minlength=len(stacks))
+    own, total = Counter(), Counter()
+    for stack, count in zip(stacks, samples_per_stack):
+        if count:
+            own[stack[-1]] += count
+            for function in set(stack):
+                total[function] += count
+    return own, total
+
+
+def slow_frame_samples(sample_times, frames, factor=1.5):
+    """which samples fall within a frame that took more than factor times the median frame period"""
+    flips = frames['flip'][np.isfinite(frames['flip'])]
+    intervals = np.diff(flips)
+    if not len(intervals):
+        return np.zeros(len(sample_times), dtype=bool), 0
+    slow = np.flatnonzero(intervals > factor*np.median(intervals))
+    #frame i+1 is slow: samples between flip i and flip i+1
+    position = np.searchsorted(flips, sample_times)-1
+    in_slow = np.isin(position, slow)
+    return in_slow, len(slow)
+
+
+def _top(counts, nr_samples, top):
+    return "\n".join("%7d %5.1f%%  %s"%(count, 100*count/nr_samples, function) for function, count in counts.most_common(top))
+
+
+def format_report(profile, frames=None, top=25):
+    nr_samples = len(profile['sample_times'])
+    if not nr_samples:
+        return "No samples\n"
+
+    own, total = hot_functions(profile['stacks'], profile['sample_stacks'])
+    lines = ["%d samples over %.1f s (interval %.1f ms), sampling took %.2f%% of the run"%(
+                 nr_samples, profile['duration'], 1000*profile['interval'], 100*profile['sampling_time']/profile['duration']),
+             "",
+             "Own samples (function at the top of the stack):", _top(own, nr_samples, top),
+             "",
+             "Total samples (function anywhere in the stack):", _top(total, nr_samples, top)]
+
+    if frames is not None:
+        in_slow, nr_slow = slow_frame_samples(profile['sample_times'], frames)
+        lines += ["", "%d slow frames, %d samples during them. own samples:"%(nr_slow, in_slow.sum())]
+        if in_slow.any():
+            slow_own, _ = hot_functions(profile['stacks'], profile['sample_stacks'][in_slow])
+            lines.append(_top(slow_own, in_slow.sum(), top))
+
+    pauses = 1000*profile['gc_pause']
+    lines += ["", "Garbage collections: %d (generation 0/1/2: %s), total %.1f ms, max %.2f ms, %d longer than 1 ms"%(
+                  len(pauses), "/".join(str(np.sum(profile['gc_generation'] == g)) for g in range(3)),
+                  pauses.sum(), pauses.max(initial=0), np.sum(pauses > 1)),
+              "Allocated memory blocks: peak %d, at %.2f s"%(profile['peak_blocks'], profile['peak_blocks_time'])]
+    return "\n".join(lines)+"\n"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report of a profile saved by SamplingProfiler")
+    parser.add_argument('profile', help="*_profile.npz")
+    parser.add_argument('--frames', default=None, help="*_FrameTiming.npy of the run, for the functions sampled during slow frames")
+    parser.add_argument('--top', type=int, default=25)
+    args = parser.parse_args(argv)
+
+    frames = None if args.frames is None else np.load(args.frames)
+    print(format_report(load_profile(args.profile), frames, args.top), end='')
+
+
+if __name__ == '__main__':
+    main()
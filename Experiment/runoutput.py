@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 20:52:30 2026
+
+Per-run output bundle: one uncompressed .npz per run (<output_str>_run.npz) with
+plain and structured arrays only, so it loads without allow_pickle:
+- metadata: JSON string (subject, session, task, run, compiled settings, ...)
+- scores: one row of scoring.SCORE_DTYPE
+- reaction_times: reaction times of the hits
+- dot_switch_color_times
+- events: every key event (eventlog.EVENT_DTYPE)
+- trials: the trial table (plan.TRIAL_DTYPE)
+
+np.load only reads the members that are accessed, so a study table (metadata
+and scores of every run) is built without reading the events. To collect all
+runs under logs/ into one table, run from within the Experiment folder:
+    python runoutput.py ./logs --output study.npz
+"""
+
+import argparse
+import dataclasses
+import glob
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+from eventlog import EVENT_DTYPE
+from scoring import SCORE_DTYPE
+
+opj = os.path.join
+
+
+RUN_SUFFIX = '_run.npz'
+FORMAT_VERSION = 1
+
+RUN_INFO_DTYPE = np.dtype([('subject', 'U32'),
+                           ('session', 'U32'),
+                           ('task', 'U32'),
+                           ('run', 'U32'),
+                           ('output_str', 'U128')])
+
+STUDY_DTYPE = np.dtype(RUN_INFO_DTYPE.descr+SCORE_DTYPE.descr)
+
+
+def parse_output_str(output_str):
+    """subject, session, task and run from sub-001_ses-1_task-1R_run-1 (see main.run_paths)"""
+    parts = output_str.split('_')
+    if len(parts) != 4:
+        return {'subject':'', 'session':'', 'task':'', 'run':''}
+    return dict(zip(['subject', 'session', 'task', 'run'], parts))
+
+
+def run_metadata(output_str, config, **extra):
+    metadata = dict(parse_output_str(output_str), output_str=output_str,
+                    format_version=FORMAT_VERSION,
+                    date=datetime.now().isoformat(timespec='seconds'),
+                    settings=dataclasses.asdict(config))
+    metadata.update(extra)
+    return metadata
+
+
+def save_run(filename, metadata, scores, reaction_times, dot_switch_color_times, events, trials):
+    np.savez(filename,
+             metadata=np.array(json.dumps(metadata)),
+             scores=np.asarray(scores, dtype=SCORE_DTYPE).reshape(1),
+             reaction_times=np.asarray(reaction_times, dtype=float),
+             dot_switch_color_times=np.asarray(dot_switch_color_times, dtype=float),
+             events=events,
+             trials=trials)
+
+
+def load_run(filename, members=None):
+    """members (default: all) of a run bundle. only these are read from the file"""
+    with np.load(filename, allow_pickle=False) as f:
+        members = f.files if members is None else members
+        run = {member:f[member] for member in members}
+
+    if 'metadata' in run:
+        run['metadata'] = json.loads(run['metadata'].item())
+    return run
+
+
+def find_runs(log_root):
+    """all run bundles under a folder, e.g. logs/"""
+    return sorted(glob.glob(opj(log_root, '**', '*'+RUN_SUFFIX), recursive=True))
+
+
+def _study_row(filename):
+    run = load_run(filename, members=['metadata', 'scores'])
+    row = np.zeros(1, dtype=STUDY_DTYPE)
+    for field in RUN_INFO_DTYPE.names:
+        row[field] = run['metadata'].get(field, '')
+    for field in SCORE_DTYPE.names:
+        row[field] = run['scores'][field]
+    return row
+
+
+def study_table(run_files, n_workers=8):
+    """one row per run: subject, session, task, run and scores. the files are read in parallel"""
+    if not run_files:
+        return np.zeros(0, dtype=STUDY_DTYPE)
+
+    with ThreadPoolExecutor(max_workers=n_workers) as pool:
+        return np.concatenate(list(pool.map(_study_row, run_files)))
+
+
+def study_events(run_files, n_workers=8):
+    """events of all runs in one array, with the index of the run (in run_files) of each event"""
+    with ThreadPoolExecutor(max_workers=n_workers) as pool:
+        events = list(pool.map(lambda filename: load_run(filename, members=['events'])['events'], run_files))
+
+    if not events:
+        return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=EVENT_DTYPE)
+    run_index = np.repeat(np.arange(len(events), dtype=np.int32), [len(e) for e in events])
+    return run_index, np.concatenate(events)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Collect the output of all runs under a folder into one study table")
+    parser.add_argument('log_root', nargs='?', default='./logs')
+    parser.add_argument('--output', default='study.npz')
+    parser.add_argument('--events', action='store_true', help="also save the events of all runs")
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args(argv)
+
+    run_files = find_runs(args.log_root)
+    study = {'runs':study_table(run_files, args.workers), 'run_files':np.array(run_files, dtype=str)}
+    if args.events:
+        study['event_run_index'], study['events'] = study_events(run_files, args.workers)
+
+    np.savez(args.output, **study)
+    print("Saved %d runs in %s"%(len(run_files), args.output))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 19:02:41 2026
+
+Several runs of one scanning session in a single process. The window is
+created once, and the PRF stimulus, mask and fixation dots are reused by all
+runs with the same parameters (e.g. same squares in bar and bar width), so that
+between runs only the trial sequence is created again. Each run still has its
+own output directory and logs.
+
+Run from within the Experiment folder:
+    python main.py session sub-001 ses-1 --runs task-1R:run-1 task-2R:run-1 task-1R:run-2
+"""
+
+import argparse
+import json
+import os
+import time
+
+opj = os.path.join
+
+
+class SessionAssets(object):
+    """window and stimuli shared by the runs of one session"""
+
+    def __init__(self):
+        self.win = None
+        self.record_frame_intervals = None
+        self.stimuli = {}
+        self.nr_created = 0
+        self.nr_reused = 0
+
+    def window(self, create):
+        """the window created by the first run. later runs get it back as it was created, with an empty frame interval log"""
+        if self.win is None:
+            self.win = create()
+            self.record_frame_intervals = self.win.recordFrameIntervals
+        else:
+            #exptools2's close stops recording frame intervals, and leaves those of the previous run in the log
+            self.win.frameIntervals = []
+            self.win.recordFrameIntervals = self.record_frame_intervals
+        return self.win
+
+    def get_or_create(self, name, create, **parameters):
+        key = (name, json.dumps(parameters, sort_keys=True, default=str))
+        if key in self.stimuli:
+            self.nr_reused += 1
+        else:
+            self.stimuli[key] = create()
+            self.nr_created += 1
+        return self.stimuli[key]
+
+    def close(self):
+        if self.win is not None:
+            self.win.close()
+            self.win = None
+        self.stimuli = {}
+
+
+def parse_run(task_run):
+    """task and run from 'task-1R:run-1'"""
+    task, _, run = task_run.partition(':')
+    if not task.startswith('task-') or not run:
+        raise ValueError(f"Runs must be given as task-<Task>:run-<run>, got {task_run!r}")
+    return task, run
+
+
+def plan_file_for_run(plan_dir, output_str):
+    """plan created with plan.py for this run, if there is one"""
+    if plan_dir is None:
+        return None
+    plan_file = opj(plan_dir, output_str+'_plan.npz')
+    return plan_file if os.path.exists(plan_file) else None
+
+
+def run_session(subject, sess, runs, plan_dir=None):
+    """runs (list of (task, run)) one after the other, in the same window"""
+    from main import run_paths
+    from session import PRFSession
+
+    assets = SessionAssets()
+    try:
+        for task, run in runs:
+            t0 = time.perf_counter()
+            output_str, output_dir, settings_file = run_paths(subject, sess, task, run)
+            session = PRFSession(output_str=output_str, output_dir=output_dir, settings_file=settings_file,
+                                 plan_file=plan_file_for_run(plan_dir, output_str), assets=assets)
+            print(f"{output_str}: ready in {time.perf_counter()-t0:.2f} s "
+                  f"({assets.nr_created} stimuli created, {assets.nr_reused} reused so far)")
+            session.run()
+    finally:
+        assets.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run several runs of one session in the same window")
+    parser.add_argument('subject')
+    parser.add_argument('sess')
+    parser.add_argument('--runs', nargs='+', required=True, help="e.g. task-1R:run-1 task-2R:run-1")
+    parser.add_argument('--plan-dir', default=None, help="folder with run plans created with plan.py")
+    args = parser.parse_args(argv)
+
+    run_session(args.subject, args.sess, [parse_run(task_run) for task_run in args.runs], args.plan_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 21:30:06 2026
+
+Absolute trial deadlines for runs that are not synced to the scanner. The end
+of every trial is computed once, from the start of the run and the nominal
+trial durations, and rounded to the display refresh grid. A trial ends on the
+frame whose flip is closest to its deadline, so a late frame delays at most one
+trial onset and does not shift all the following ones.
+
+At the end of the run, the onset of each trial (first flip, from the frame
+timing log) is compared to its nominal onset.
+"""
+
+import numpy as np
+
+
+#exptools2 runs each phase until session.timer, which it advances by the phase duration, runs out. with a schedule, trials
+#end at their deadline instead (exit_phase, in PRFTrial.get_events), so this margin (s) is added to the phase duration, so
+#that the phase never runs out first. a bounded margin is safe because exptools2 resets session.timer whenever a phase
+#is exited, so the margin never adds up over trials, and a trial only outlasts its nominal duration by the lateness of
+#its own onset, a few frames after dropped frames (tests/test_schedule.py). the margin is finite, so that a trial that
+#misses its deadline still ends
+SCHEDULED_PHASE_MARGIN = 100.0
+
+ONSET_DTYPE = np.dtype([('trial_nr', np.int32),
+                        ('nominal_onset', np.float64),
+                        ('onset', np.float64),
+                        ('error', np.float64)])
+
+
+class TrialSchedule(object):
+
+    def __init__(self, phase_durations, frame_period=1/60.0):
+        self.phase_durations = np.asarray(phase_durations, dtype=float)
+        self.frame_period = frame_period
+        #nominal onset of each trial, and end of the last one, from the start of the run
+        self.nominal_onsets = np.concatenate(([0.0], np.cumsum(self.phase_durations)))
+        self.start_time = None
+        self._exit_times = None
+
+    def __len__(self):
+        return len(self.phase_durations)
+
+    def start(self, start_time):
+        """fix the deadlines, with the first trial starting at start_time (on the session clock)"""
+        self.start_time = start_time
+        frame_period = self.frame_period
+        self.deadlines = start_time + frame_period*np.round(self.nominal_onsets[1:]/frame_period)
+
+        #a trial is checked right after each flip. exiting then puts the next trial on the following flip,
+        #one frame later, so exit once that flip is within half a frame of the deadline
+        self._exit_times = (self.deadlines - 1.5*frame_period).tolist()
+
+    def trial_over(self, trial_nr, time):
+        """whether the trial should end now. the first call, right after the first flip of the run, starts the schedule"""
+        if self.start_time is None:
+            self.start(time)
+        return time >= self._exit_times[trial_nr]
+
+    def onsets(self, frames):
+        """nominal and actual onset (first flip) of every trial, from the frames logged by frametiming.FrameTimer"""
+        onsets = np.zeros(len(self), dtype=ONSET_DTYPE)
+        onsets['trial_nr'] = np.arange(len(self))
+        onsets['nominal_onset'] = self.start_time + self.nominal_onsets[:-1]
+        onsets['onset'] = np.nan
+
+        frames = frames[(frames['trial_nr'] >= 0) & (frames['trial_nr'] < len(self)) & np.isfinite(frames['flip'])]
+        trials, first_frame = np.unique(frames['trial_nr'], return_index=True)
+        onsets['onset'][trials] = frames['flip'][first_frame]
+
+        onsets['error'] = onsets['onset'] - onsets['nominal_onset']
+        return onsets
+
+    def summary(self, onsets):
+        errors = 1000*onsets['error'][np.isfinite(onsets['error'])]
+        if not len(errors):
+            return {'Trials':0}
+
+        percentiles = [50, 95, 99, 100]
+        return {'Trials':len(errors),
+                'Onset error percentiles (ms)':dict(zip(percentiles, np.percentile(np.abs(errors), percentiles))),
+                'Mean onset error (ms)':float(np.mean(errors)),
+                'Trials within one frame':int(np.sum(np.abs(errors) <= 1000*self.frame_period+0.01))}
+
+
+def print_summary(summary):
+    print(f"Scheduled trials: {summary['Trials']}")
+    if not summary['Trials']:
+        return
+    print("Onset error (ms): "+", ".join(f"p{p} {v:.2f}" for p, v in summary['Onset error percentiles (ms)'].items())+
+          f", mean {summary['Mean onset error (ms)']:.2f}")
+    print(f"Trials within one frame of nominal onset: {summary['Trials within one frame']}")
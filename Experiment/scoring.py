@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 17:05:18 2026
+
+Offline scoring of the fixation dot task. Every response is matched to the
+nearest preceding dot color switch with np.searchsorted: the first response
+within the response interval after a switch is a hit, switches without one are
+misses, and all other responses are false alarms. Many runs are scored in one
+call, by placing them one after the other on a common time axis.
+
+To score saved runs, run from within the Experiment folder:
+    python scoring.py ./logs/*_Logs
+"""
+
+import argparse
+import glob
+import os
+from statistics import NormalDist
+
+import numpy as np
+
+opj = os.path.join
+
+
+SCORE_DTYPE = np.dtype([('switches', np.int32),
+                        ('responses', np.int32),
+                        ('hits', np.int32),
+                        ('misses', np.int32),
+                        ('false_alarms', np.int32),
+                        ('hit_rate', np.float64),
+                        ('false_alarm_rate', np.float64),
+                        ('d_prime', np.float64),
+                        ('median_rt', np.float64),
+                        ('mean_rt', np.float64)])
+
+
+def d_prime(hits, switches, false_alarms, noise_trials):
+    """d' with the log-linear correction, so that it is finite for perfect runs and runs without responses"""
+    hit_rate = (np.asarray(hits)+0.5)/(np.asarray(switches)+1.0)
+    false_alarm_rate = (np.asarray(false_alarms)+0.5)/(np.asarray(noise_trials)+1.0)
+    z = np.vectorize(NormalDist().inv_cdf, otypes=[float])
+    return z(hit_rate)-z(false_alarm_rate)
+
+
+def score_runs(response_times, dot_switch_color_times, response_interval, run_durations=None):
+    """
+    scores (one SCORE_DTYPE row per run) and reaction times of the hits of each run,
+    from the response times and dot switch times of each run (sequences of arrays, in seconds)
+    """
+    nr_runs = len(dot_switch_color_times)
+    if len(response_times) != nr_runs:
+        raise ValueError("response_times and dot_switch_color_times must contain the same number of runs")
+
+    switches = [np.sort(np.asarray(s, dtype=float)) for s in dot_switch_color_times]
+    responses = [np.sort(np.asarray(r, dtype=float)) for r in response_times]
+    nr_switches = np.array([len(s) for s in switches], dtype=int)
+    nr_responses = np.array([len(r) for r in responses], dtype=int)
+
+    if run_durations is None:
+        run_durations = [max(s[-1] if len(s) else 0.0, r[-1] if len(r) else 0.0)+response_interval
+                         for s, r in zip(switches, responses)]
+    run_durations = np.asarray(run_durations, dtype=float)
+
+    #runs one after the other on a common time axis, with a gap longer than the response interval
+    #in between, so that a single searchsorted never matches a response to a switch of another run
+    run_starts = np.concatenate(([0.0], np.cumsum(run_durations+response_interval+1.0)[:-1]))
+    switch_run = np.repeat(np.arange(nr_runs), nr_switches)
+    response_run = np.repeat(np.arange(nr_runs), nr_responses)
+    all_switches = np.concatenate(switches+[np.zeros(0)])+run_starts[switch_run]
+    all_responses = np.concatenate(responses+[np.zeros(0)])+run_starts[response_run]
+
+    #nearest preceding switch of every response
+    preceding = np.searchsorted(all_switches, all_responses, side='right')-1
+    matched = preceding >= 0
+    matched[matched] = switch_run[preceding[matched]] == response_run[matched]
+    #without any switch, every response is an unmatched false alarm
+    preceding_switches = all_switches[np.maximum(preceding, 0)] if len(all_switches) else np.zeros(len(all_responses))
+    reaction_times = np.where(matched, all_responses-preceding_switches, np.inf)
+    in_window = reaction_times < response_interval
+
+    #only the first response after a switch is a hit. responses are sorted, so that is the first occurrence
+    hit_switches, first = np.unique(preceding[in_window], return_index=True)
+    hit_responses = np.flatnonzero(in_window)[first]
+
+    hits = np.bincount(switch_run[hit_switches], minlength=nr_runs)
+    false_alarms = nr_responses-hits
+    misses = nr_switches-hits
+    #the time outside the response windows, in response intervals, is the number of chances for a false alarm
+    noise_trials = np.maximum((run_durations-nr_switches*response_interval)/response_interval, 0.0)
+
+    hit_rts = np.split(reaction_times[hit_responses], np.cumsum(hits)[:-1])[:nr_runs]
+
+    scores = np.zeros(nr_runs, dtype=SCORE_DTYPE)
+    scores['switches'] = nr_switches
+    scores['responses'] = nr_responses
+    scores['hits'] = hits
+    scores['misses'] = misses
+    scores['false_alarms'] = false_alarms
+    with np.errstate(invalid='ignore', divide='ignore'):
+        scores['hit_rate'] = hits/nr_switches
+        scores['false_alarm_rate'] = np.minimum(false_alarms/noise_trials, 1.0)
+    #without switches, the hit rate is undefined and so is d'
+    scores['d_prime'] = np.where(nr_switches > 0, d_prime(hits, nr_switches, false_alarms, noise_trials), np.nan)
+    scores['median_rt'] = [np.median(rts) if len(rts) else np.nan for rts in hit_rts]
+    scores['mean_rt'] = [np.mean(rts) if len(rts) else np.nan for rts in hit_rts]
+
+    return scores, hit_rts
+
+
+def score_run(response_times, dot_switch_color_times, response_interval, run_duration=None):
+    """scores (as a dict) and reaction times of the hits of one run"""
+    scores, hit_rts = score_runs([response_times], [dot_switch_color_times], response_interval,
+                                 None if run_duration is None else [run_duration])
+    return {name:scores[name][0].item() for name in SCORE_DTYPE.names}, hit_rts[0]
+
+
+def rt_histogram(hit_rts, response_interval, bins=16):
+    """reaction time distribution of each run: counts (runs x bins) and bin edges"""
+    edges = np.linspace(0, response_interval, bins+1)
+    return np.array([np.histogram(rts, edges)[0] for rts in hit_rts]).reshape(-1, bins), edges
+
+
+def load_run(log_dir):
+    """output_str, response times and dot switch times of a run saved by PRFSession"""
+    from runoutput import RUN_SUFFIX, load_run as load_run_output
+    from eventlog import EventRecorder, EVENT_CODES
+
+    run_files = glob.glob(opj(log_dir, '*'+RUN_SUFFIX))
+    if run_files:
+        run = load_run_output(run_files[0], members=['metadata', 'events', 'dot_switch_color_times'])
+        events = run['events']
+        return (run['metadata']['output_str'], events['onset'][events['event_type'] == EVENT_CODES['response']],
+                run['dot_switch_color_times'])
+
+    #runs saved before the run bundle existed
+    switch_files = glob.glob(opj(log_dir, '*_DotSwitchColorTimes.npy'))
+    if not switch_files:
+        raise FileNotFoundError(f"No run output in {log_dir}")
+    output_str = os.path.basename(switch_files[0])[:-len('_DotSwitchColorTimes.npy')]
+    dot_switch_color_times = np.load(switch_files[0])
+
+    #the binary event stream has every response, even after a crash. otherwise, read the exptools2 log
+    stream_file = opj(log_dir, output_str+'_events.bin')
+    if os.path.exists(stream_file):
+        events = EventRecorder.load(stream_file)
+        response_times = events['onset'][events['event_type'] == EVENT_CODES['response']]
+    else:
+        import pandas as pd
+        log = pd.read_csv(opj(log_dir, output_str+'_events.tsv'), sep='\t')
+        response_times = log.loc[log['event_type'] == 'response', 'onset'].to_numpy(dtype=float)
+
+    return output_str, response_times, dot_switch_color_times
+
+
+def load_response_interval(log_dir, default=0.8):
+    """response interval in the settings saved with the run"""
+    from runoutput import RUN_SUFFIX, load_run as load_run_output
+
+    run_files = glob.glob(opj(log_dir, '*'+RUN_SUFFIX))
+    if run_files:
+        return load_run_output(run_files[0], members=['metadata'])['metadata']['settings']['response_interval']
+
+    settings_files = glob.glob(opj(log_dir, '*_expsettings.yml'))
+    if not settings_files:
+        return default
+
+    from plan import load_settings
+    return float(load_settings(settings_files[0]).get('Task settings', {}).get('response interval', default))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score the fixation dot task of saved runs")
+    parser.add_argument('log_dirs', nargs='+', help="output folders of PRFSession, e.g. ./logs/*_Logs")
+    parser.add_argument('--response-interval', type=float, default=None,
+                        help="default: the response interval in the settings saved with the first run")
+    parser.add_argument('--output', default=None, help="save the scores of all runs to this .npy file")
+    args = parser.parse_args(argv)
+
+    runs = [load_run(log_dir) for log_dir in args.log_dirs]
+    response_interval = args.response_interval
+    if response_interval is None:
+        response_interval = load_response_interval(args.log_dirs[0])
+
+    scores, hit_rts = score_runs([run[1] for run in runs], [run[2] for run in runs], response_interval)
+
+    for (output_str, _, _), score in zip(runs, scores):
+        print(f"{output_str}: {score['hits']}/{score['switches']} hits, {score['false_alarms']} false alarms, "
+              f"d' {score['d_prime']:.2f}, median RT {1000*score['median_rt']:.0f} ms")
+
+    if args.output is not None:
+        np.save(args.output, scores)
+
+
+if __name__ == '__main__':
+    main()
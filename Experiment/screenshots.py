@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 14:48:26 2026
+
+Background writer for the scanner-synced screenshots. Each captured frame is
+handed to a pool of worker processes, which downsample, optionally binarize and
+save it as png while the experiment continues. At most max_queue frames are in
+flight at any time, so memory use does not grow with the length of the run.
+
+The workers are spawned (not forked from a process holding the GL context and
+running threads), and all of them are started when the writer is created, so
+that no process is started from the frame loop.
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+opj = os.path.join
+
+
+def process_frame(frame, downsample=1, binarize=None):
+    """block-average downsampling and optional binarization (frame values 0-255) of an (h, w, channels) frame"""
+    if downsample > 1:
+        h = frame.shape[0]//downsample*downsample
+        w = frame.shape[1]//downsample*downsample
+        frame = frame[:h,:w].reshape(h//downsample, downsample, w//downsample, downsample, -1).mean(axis=(1, 3))
+
+    if binarize is not None:
+        #anything differing from the gray background by more than the threshold is stimulus
+        frame = 255*(np.abs(frame.astype(float)-128).max(axis=-1) > binarize)
+
+    return np.squeeze(np.round(frame).astype(np.uint8))
+
+
+def _noop():
+    pass
+
+
+def _save_frame(frame, filename, downsample, binarize):
+    from PIL import Image
+
+    Image.fromarray(process_frame(frame, downsample, binarize)).save(filename)
+    return filename
+
+
+class ScreenshotWriter(object):
+
+    def __init__(self, screen_dir, output_str, downsample=1, binarize=None, max_queue=16, n_workers=2):
+        self.screen_dir = screen_dir
+        self.output_str = output_str
+        self.downsample = downsample
+        self.binarize = binarize
+        self.max_queue = max_queue
+
+        self.pool = ProcessPoolExecutor(max_workers=n_workers, mp_context=multiprocessing.get_context('spawn'))
+        #workers are only started on submit: one no-op per worker, submitted at once, starts all of them now
+        for future in [self.pool.submit(_noop) for _ in range(n_workers)]:
+            future.result()
+        self._slots = threading.BoundedSemaphore(max_queue)
+        self._lock = threading.Lock()
+
+        self.nr_frames = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        #backpressure: number of captures that had to wait for a free slot, and total time waited
+        self.nr_waits = 0
+        self.wait_time = 0.0
+        self.errors = []
+
+    def capture(self, win):
+        """grab the front buffer of the window and queue it for saving"""
+        win.getMovieFrame()
+        #do not let psychopy accumulate the frames
+        image = win.movieFrames.pop()
+        self.submit(np.asarray(image))
+
+    def submit(self, frame):
+        if not self._slots.acquire(blocking=False):
+            t0 = time.perf_counter()
+            self._slots.acquire()
+            self.nr_waits += 1
+            self.wait_time += time.perf_counter()-t0
+
+        self.nr_frames += 1
+        #same file names as win.saveMovieFrames
+        filename = opj(self.screen_dir, '%s_Screenshot%03d.png'%(self.output_str, self.nr_frames))
+
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+        future = self.pool.submit(_save_frame, frame, filename, self.downsample, self.binarize)
+        future.add_done_callback(self._done)
+
+    def _done(self, future):
+        with self._lock:
+            self.in_flight -= 1
+        if future.exception() is not None:
+            self.errors.append(future.exception())
+        self._slots.release()
+
+    def report(self):
+        return {'Screenshots':self.nr_frames,
+                'Max frames in flight':self.max_in_flight,
+                'Queue size':self.max_queue,
+                'Captures that waited for the writer':self.nr_waits,
+                'Total time waited (s)':self.wait_time,
+                'Errors':len(self.errors)}
+
+    def close(self):
+        """wait for all frames to be written"""
+        self.pool.shutdown(wait=True)
+        for error in self.errors:
+            print(f"Warning: screenshot could not be saved: {error}")
+        return self.report()
+
+
+def print_report(report):
+    print(f"Screenshots: {report['Screenshots']}, errors: {report['Errors']}")
+    print(f"Max frames in flight: {report['Max frames in flight']} (queue size {report['Queue size']})")
+    if report['Captures that waited for the writer']:
+        print(f"Captures that waited for the writer: {report['Captures that waited for the writer']}, "
+              f"total {report['Total time waited (s)']:.3f} s")
@@ -8,13 +8,26 @@ Created on Mon Feb 25 14:05:10 2019
 
 import numpy as np
 import os
-from psychopy import visual
+from psychopy import visual, event
 from psychopy.visual import filters
 from psychopy import tools
 
 from exptools2.core.session import Session
 from trial import PRFTrial
 from stim import PRFStim
+from cache import ArrayCache
+from plan import RunPlan, create_plan, load_config, load_plan, total_time, trial_table
+from eventlog import EventRecorder
+from scoring import score_run
+from runoutput import run_metadata, save_run
+from frametiming import FrameTimer, print_summary
+from framelog import StimulusLog, capacity_for
+from screenshots import ScreenshotWriter, print_report as print_screenshot_report
+from triggers import TriggerEmulator, inject_key
+from inputs import InputPoller, KeyboardSource
+from schedule import TrialSchedule, print_summary as print_schedule_summary
+from metrics import MetricsPublisher, SessionMetrics
+from profiler import SamplingProfiler
 
 opj = os.path.join
 
@@ -23,34 +36,85 @@ opj = os.path.join
 class PRFSession(Session):
 
     
-    def __init__(self, output_str, output_dir, settings_file):
+    def __init__(self, output_str, output_dir, settings_file, plan_file=None, assets=None):
         
+        #window and stimuli shared with the other runs of the same session (see runs.py)
+        self.assets = assets
+        
+        #settings are validated and compiled once, before exptools2 opens the window, so that errors in the settings file
+        #are raised without a (fullscreen) window. everything after this reads self.config instead of the nested settings dict
+        self.config = self._load_config(settings_file)
         
         super().__init__(output_str=output_str, output_dir=output_dir, settings_file=settings_file)
         
+        #optional run plan created in advance with plan.py
+        self.plan_file = plan_file
+        
         #if we are scanning, here I set the mri_trigger manually to the 't'. together with the change in trial.py, this ensures syncing
-        if self.settings['mri']['topup_scan']==True:
-            self.topup_scan_duration=self.settings['mri']['topup_duration']
+        if self.config.topup_scan:
+            self.topup_scan_duration=self.config.topup_duration
         
-        if self.settings['PRF stimulus settings']['Scanner sync']==True:
-            self.bar_step_length = self.settings['mri']['TR']
+        if self.config.scanner_sync:
             self.mri_trigger='t'
-
-                     
+        
+        #keys are polled on a background thread, timestamped on the session clock, and drained by get_events.
+        #the keyboard is opened here, so that a backend that cannot be polled from a thread is refused before the run
+        if self.config.input_polling_rate is not None:
+            self.input_poller = InputPoller(self.clock, KeyboardSource(self.clock), rate=self.config.input_polling_rate)
         else:
-            self.bar_step_length = self.settings['PRF stimulus settings']['Bar step length']
+            self.input_poller = None
+        
+        #emulated scanner pulses, to test scanner sync without a scanner
+        if self.config.trigger_emulator:
+            self.trigger_emulator = TriggerEmulator.from_config(self.config, inject=self._inject_key)
+        
+        self.bar_step_length = self.config.trial_duration
             
-        if self.settings['PRF stimulus settings']['Screenshot']==True:
+        if self.config.screenshot:
             self.screen_dir=output_dir+'/'+output_str+'_Screenshots'
             if not os.path.exists(self.screen_dir):
                 os.mkdir(self.screen_dir)
+            #screenshots are downsampled and saved in the background while the experiment runs
+            self.screenshot_writer = ScreenshotWriter(self.screen_dir, output_str,
+                                                      downsample=self.config.screenshot_downsampling,
+                                                      binarize=self.config.screenshot_binarize_threshold)
             
         
             
         
+        #key events are recorded in a preallocated buffer, optionally also streamed to file so that nothing is lost in a crash
+        if self.config.stream_events:
+            self.event_recorder = EventRecorder(stream_file=opj(output_dir, output_str+'_events.bin'))
+        else:
+            self.event_recorder = EventRecorder()
+        
+        #draw and flip times of every frame
+        self.frame_timer = FrameTimer(self.clock)
+        
+        #textures and mask only depend on the settings and window, so they are cached across runs
+        if self.config.cache_directory is not None:
+            self.cache = ArrayCache(self.config.cache_directory, max_size_mb=self.config.cache_size_mb)
+        else:
+            self.cache = None
+        
         #create all stimuli and trials at the beginning of the experiment, to save time and resources        
+        if self.config.profile_startup:
+            startup_profiler = SamplingProfiler(self.config.profile_interval)
+            startup_profiler.start()
         self.create_stimuli()
         self.create_trials()
+        if self.config.profile_startup:
+            startup_profiler.stop()
+            startup_profiler.save(opj(output_dir, output_str+'_startup'))
+        
+        #the run itself is profiled from the start of the experiment clock (see run)
+        self.profiler = None
+        
+        #snapshots of the run for the operator console, sent from a background thread (metrics.py)
+        if self.config.metrics_port is not None:
+            self.metrics_publisher = MetricsPublisher(SessionMetrics(self).snapshot, self.config.metrics_port)
+        else:
+            self.metrics_publisher = None
             
         
 
@@ -62,11 +126,20 @@ class PRFSession(Session):
         
 
         
-        #generate PRF stimulus
-        self.prf_stim = PRFStim(session=self, 
-                        squares_in_bar=self.settings['PRF stimulus settings']['Squares in bar'], 
-                        bar_width_deg=self.settings['PRF stimulus settings']['Bar width in degrees'],
-                        flicker_frequency=self.settings['PRF stimulus settings']['Checkers motion speed'])#self.deg2pix(self.settings['prf_max_eccentricity']))    
+        #generate PRF stimulus. in a multi-run session, this is reused by all runs with the same bar parameters and monitor,
+        #which sets the bar width in pixels
+        self.prf_stim = self._stimulus('prf_stim',
+                                       lambda: PRFStim(session=self, 
+                                                       squares_in_bar=self.config.squares_in_bar, 
+                                                       bar_width_deg=self.config.bar_width_deg,
+                                                       flicker_frequency=self.config.flicker_frequency,
+                                                       cache=self.cache),#self.deg2pix(self.settings['prf_max_eccentricity']))    
+                                       squares_in_bar=self.config.squares_in_bar,
+                                       bar_width_deg=self.config.bar_width_deg,
+                                       flicker_frequency=self.config.flicker_frequency,
+                                       monitor_width=self.monitor.getWidth(),
+                                       monitor_distance=self.monitor.getDistance(),
+                                       monitor_size_pix=self.monitor.getSizePix())
         
 
         #currently unused
@@ -74,35 +147,46 @@ class PRFSession(Session):
         
 
         #generate raised cosine alpha mask
-        mask = filters.makeMask(matrixSize=self.win.size[0], 
-                                shape='raisedCosine', 
-                                radius=np.array([self.win.size[1]/self.win.size[0], 1.0]),
-                                center=(0.0, 0.0), 
-                                range=[-1, 1], 
-                                fringeWidth=0.02
-                                )
+        mask_params = dict(matrixSize=self.win.size[0], 
+                           shape='raisedCosine', 
+                           radius=np.array([self.win.size[1]/self.win.size[0], 1.0]),
+                           center=(0.0, 0.0), 
+                           range=[-1, 1], 
+                           fringeWidth=0.02
+                           )
 
         #adjust mask size in case the stimulus runs on a mac 
-        if self.settings['operating system'] == 'mac':
+        if self.config.operating_system == 'mac':
             mask_size = [self.win.size[0]/2,self.win.size[1]/2]
         else: 
             mask_size = [self.win.size[0],self.win.size[1]]
+        
+        def make_mask_stim():
+            if self.cache is None:
+                mask = filters.makeMask(**mask_params)
+            else:
+                mask = self.cache.get_or_create('mask',
+                                                lambda: filters.makeMask(**mask_params),
+                                                win_size=list(self.win.size),
+                                                **dict(mask_params, radius=list(mask_params['radius'])))
             
-        self.mask_stim = visual.GratingStim(self.win, 
-                                        mask=-mask, 
-                                        tex=None, 
-                                        units='pix',
-                                        
-                                        size=mask_size, 
-                                        pos = np.array((0.0,0.0)), 
-                                        color = [0,0,0]) 
+            return visual.GratingStim(self.win, 
+                                      mask=-mask, 
+                                      tex=None, 
+                                      units='pix',
+                                      
+                                      size=mask_size, 
+                                      pos = np.array((0.0,0.0)), 
+                                      color = [0,0,0]) 
+        
+        self.mask_stim = self._stimulus('mask_stim', make_mask_stim, win_size=list(self.win.size), mask_size=mask_size)
         
 
 
 
         #as current basic task, generate fixation circles of different colors, with black border
         
-        fixation_radius_pixels=tools.monitorunittools.deg2pix(self.settings['PRF stimulus settings']['Size fixation dot in degrees'], self.monitor)/2
+        fixation_radius_pixels=tools.monitorunittools.deg2pix(self.config.fixation_dot_size_deg, self.monitor)/2
 
 #        self.fixation_circle = visual.Circle(self.win, 
 #            radius=fixation_radius_pixels, 
@@ -110,123 +194,116 @@ class PRFSession(Session):
         
         
         #two colors of the fixation circle for the task
-        self.fixation_disk_0 = visual.Circle(self.win, 
-            units='pix', radius=fixation_radius_pixels, 
-            fillColor=[1,-1,-1], lineColor=[1,-1,-1])
-        
-        self.fixation_disk_1 = visual.Circle(self.win, 
-            units='pix', radius=fixation_radius_pixels, 
-            fillColor=[-1,1,-1], lineColor=[-1,1,-1])
+        self.fixation_disks = self._stimulus('fixation_disks',
+                                             lambda: [visual.Circle(self.win, 
+                                                                    units='pix', radius=fixation_radius_pixels, 
+                                                                    fillColor=[1,-1,-1], lineColor=[1,-1,-1]),
+                                                      visual.Circle(self.win, 
+                                                                    units='pix', radius=fixation_radius_pixels, 
+                                                                    fillColor=[-1,1,-1], lineColor=[-1,1,-1])],
+                                             radius=fixation_radius_pixels)
+        self.fixation_disk_0, self.fixation_disk_1 = self.fixation_disks
+
+
+    def _load_config(self, settings_file):
+        """compiled settings of the session (the dry run changes some of them, see headless.py)"""
+        return load_config(settings_file)
+
+    def _stimulus(self, name, create, **parameters):
+        """new stimulus, or the one created in a previous run of the session with the same parameters"""
+        if self.assets is None:
+            return create()
+        return self.assets.get_or_create(name, create, **parameters)
+
+    def _create_window(self):
+        """in a multi-run session, all runs use the window of the first run"""
+        if self.assets is None:
+            return super()._create_window()
+        return self.assets.window(super()._create_window)
 
 
 
 
     def create_trials(self):
         """creates trials by setting up prf stimulus sequence"""
-        self.trial_list=[]
-        
-        #simple tools to check subject responses online
-        self.correct_responses = 0
-        self.total_responses = 0
-        self.dot_count = 0
         
-        bar_orientations = np.array(self.settings['PRF stimulus settings']['Bar orientations'])
-        #create as many trials as TRs. 5 extra TRs at beginning + bar passes + blanks
-        self.trial_number = 5 + self.settings['PRF stimulus settings']['Bar pass steps']*len(np.where(bar_orientations != -1)[0]) + self.settings['PRF stimulus settings']['Blanks length']*len(np.where(bar_orientations == -1)[0])
+        #create as many trials as TRs, with the bar orientation, position and direction at each TR, and the dot color change times.
+        #these are either generated now, or loaded from a plan file created in advance with plan.py
+        if self.plan_file is not None:
+            #raises if the plan was created from other settings (e.g. another task, or on another operating system)
+            plan = load_plan(self.plan_file, win_height=self.win.size[1], config=self.config)
+        else:
+            plan = create_plan(self.config, win_height=self.win.size[1])
+        
+        #the whole sequence as one structured array. PRFTrial objects are only created when each trial starts (see run)
+        self.trial_table = trial_table(self.config, plan['bar_orientation_at_TR'], plan['bar_pos_in_ori'], plan['bar_direction_at_TR'])
+        self.bar_orientation_at_TR = self.trial_table['bar_orientation']
+        self.bar_pos_in_ori = self.trial_table['bar_pos_in_ori']
+        self.bar_direction_at_TR = self.trial_table['bar_direction']
+        self.trial_number = len(self.trial_table)
+        
+        #without scanner sync, trials end at absolute deadlines from the start of the run, on the refresh grid,
+        #so that a late frame does not shift the bar positions of all following trials
+        frame_period = getattr(self.win, 'monitorFramePeriod', None) or 1/60.0
+        if self.config.scanner_sync:
+            self.schedule = None
+        else:
+            self.schedule = TrialSchedule(self.trial_table['phase_duration'], frame_period=frame_period)
   
         print("Expected number of TRs: %d"%self.trial_number)
-        #create bar orientation list at each TR (this can be done in many different ways according to necessity)
-        #for example, currently blank periods have same length as bar passes. this can easily be changed here
-        steps_array=self.settings['PRF stimulus settings']['Bar pass steps']*np.ones(len(bar_orientations))
-        blanks_array=self.settings['PRF stimulus settings']['Blanks length']*np.ones(len(bar_orientations))
-    
-        repeat_times=np.where(bar_orientations == -1, blanks_array, steps_array).astype(int)
- 
-        self.bar_orientation_at_TR = np.concatenate((-1*np.ones(5), np.repeat(bar_orientations, repeat_times)))
-        
-        
-        #calculation of positions depend on whether code is run on mac
-        if self.settings['operating system'] == 'mac':
-            bar_pos_array = (self.win.size[1]/2)*np.linspace(-0.5,0.5, self.settings['PRF stimulus settings']['Bar pass steps'])
-        else:
-            bar_pos_array = self.win.size[1]*np.linspace(-0.5,0.5, self.settings['PRF stimulus settings']['Bar pass steps'])
-        
-        
-        blank_array = np.zeros(self.settings['PRF stimulus settings']['Blanks length'])
-        
-        #the 5 empty trials at beginning
-        self.bar_pos_in_ori=np.zeros(5)
-        
-        #bar position at TR
-        for i in range(len(bar_orientations)):
-            if bar_orientations[i]==-1:
-                self.bar_pos_in_ori=np.append(self.bar_pos_in_ori, blank_array)
-            else:
-                self.bar_pos_in_ori=np.append(self.bar_pos_in_ori, bar_pos_array)
-                   
-     
-        #random bar direction at each step. could also make this time-based
-        self.bar_direction_at_TR = np.round(np.random.rand(self.trial_number))
-        
-        #trial list
-        for i in range(self.trial_number):
-                
-            self.trial_list.append(PRFTrial(session=self,
-                                            trial_nr=i,
-                                               
-                           bar_orientation=self.bar_orientation_at_TR[i],
-                           bar_position_in_ori=self.bar_pos_in_ori[i],
-                           bar_direction=self.bar_direction_at_TR[i]
-                           #,tracker=self.tracker
-                           ))
 
 
         #times for dot color change. continue the task into the topup
-        self.total_time = self.trial_number*self.bar_step_length 
-        
-        if self.settings['mri']['topup_scan']==True:
-            self.total_time += self.topup_scan_duration
-        
+        self.total_time = total_time(self.config, self.trial_number)
+        self.dot_switch_color_times = plan['dot_switch_color_times']
         
-        #DOT COLOR CHANGE TIMES    
-        self.dot_switch_color_times = np.arange(3, self.total_time, float(self.settings['Task settings']['color switch interval']))
-        self.dot_switch_color_times += (2*np.random.rand(len(self.dot_switch_color_times))-1)
         
+        #precompute bar positions, textures and dot colors, so that the frame loop only needs lookups
+        self.run_plan = RunPlan(bar_orientation_at_TR=self.bar_orientation_at_TR,
+                                bar_pos_in_ori=self.bar_pos_in_ori,
+                                bar_direction_at_TR=self.bar_direction_at_TR,
+                                dot_switch_color_times=self.dot_switch_color_times,
+                                flicker_frequency=self.config.flicker_frequency)
         
-        #needed to keep track of which dot to print
-        self.current_dot_time=0
-        self.next_dot_time=1
+        #what is on screen at every frame, in a memory-mapped file that is preallocated for the whole run (framelog.py)
+        self.stimulus_log = StimulusLog(opj(self.output_dir, self.output_str+'_StimulusLog.npy'),
+                                        capacity_for(self.total_time, frame_period))
 
         #only for testing purposes
         np.save(opj(self.output_dir, self.output_str+'_DotSwitchColorTimes.npy'), self.dot_switch_color_times)
         print(self.win.size)
 
+    def get_keys(self):
+        """keys pressed since the last call, with their time on the session clock"""
+        if self.input_poller is not None and self.input_poller.is_alive():
+            return self.input_poller.drain()
+        return event.getKeys(timeStamped=self.clock)
+    
+    def _inject_key(self, key):
+        """emulated key press, timestamped by the input poller once it runs"""
+        if self.input_poller is not None and self.input_poller.is_alive():
+            self.input_poller.push(key)
+        else:
+            inject_key(key)
+
     def draw_stimulus(self):
-        #this timing is only used for the motion of checkerboards inside the bar. it does not have any effect on the actual bar motion
+        #this timing is only used for the motion of checkerboards inside the bar and the dot color. it does not have any effect on the actual bar motion
         present_time = self.clock.getTime()
         
-        #present_trial_time = self.clock.getTime() - self.current_trial_start_time
-        prf_time = present_time #/ (self.bar_step_length)
-        
+        visible, texture_index, bar_pos, bar_orientation, dot_color = self.run_plan.frame(self.current_trial.ID, present_time)
   
         #draw the bar at the required orientation for this TR, unless the orientation is -1, code for a blank period
-        if self.current_trial.bar_orientation != -1:
-            self.prf_stim.draw(time=prf_time, 
-                               pos_in_ori=self.current_trial.bar_position_in_ori, 
-                               orientation=self.current_trial.bar_orientation,
-                               bar_direction=self.current_trial.bar_direction)
-            
+        if visible:
+            self.prf_stim.draw_texture(texture_index, bar_pos, bar_orientation)
+        else:
+            texture_index = -1
             
-        #hacky way to draw the correct dot color. could be improved
-        if self.next_dot_time<len(self.dot_switch_color_times):
-            if present_time<self.dot_switch_color_times[self.current_dot_time]:                
-                self.fixation_disk_1.draw()
-            else:
-                if present_time<self.dot_switch_color_times[self.next_dot_time]:
-                    self.fixation_disk_0.draw()
-                else:
-                    self.current_dot_time+=2
-                    self.next_dot_time+=2
+        self.fixation_disks[dot_color].draw()
+        
+        self.stimulus_log.record(present_time, self.current_trial.ID, texture_index, bar_pos, bar_orientation,
+                                 self.current_trial.bar_direction, dot_color)
+        
+        return texture_index
                     
         #self.fixation_circle.draw()
 
@@ -235,29 +312,95 @@ class PRFSession(Session):
     def run(self):
         """run the session"""
         # cycle through trials
-        self.display_text('Waiting for scanner', keys=self.settings['mri'].get('sync', 't'))
+        #the first emulated pulse ends the wait for the scanner
+        if self.config.trigger_emulator:
+            self.trigger_emulator.start()
+        self.display_text('Waiting for scanner', keys=self.config.sync_key)
 
         self.start_experiment()
         
-        for trial_idx in range(len(self.trial_list)):
-            self.current_trial = self.trial_list[trial_idx]
-            self.current_trial_start_time = self.clock.getTime()
-            self.current_trial.run()
+        #sampling profiler (profiler.py). samples are timestamped on the session clock, to match them with the frame timing
+        if self.config.profile_run:
+            self.profiler = SamplingProfiler(self.config.profile_interval, clock=self.clock)
+            self.profiler.start()
         
-        print(f"Expected number of responses: {len(self.dot_switch_color_times)}")
-        print(f"Total subject responses: {self.total_responses}")
-        print(f"Correct responses (within {self.settings['Task settings']['response interval']}s of dot color change): {self.correct_responses}")
-        np.save(opj(self.output_dir, self.output_str+'_simple_response_data.npy'), {"Expected number of responses":len(self.dot_switch_color_times),
-        														                      "Total subject responses":self.total_responses,
-        														                      f"Correct responses (within {self.settings['Task settings']['response interval']}s of dot color change)":self.correct_responses})
+        #polling starts with the experiment clock, so that keys pressed while waiting for the scanner are not logged
+        if self.input_poller is not None:
+            self.input_poller.start()
+        if self.metrics_publisher is not None:
+            self.metrics_publisher.start()
         
-        #print('Percentage of correctly answered trials: %.2f%%'%(100*self.correct_responses/len(self.dot_switch_color_times)))
+        for trial_idx in range(self.trial_number):
+            #trials are created lazily from the trial table, so startup time and memory do not grow with the run length
+            self.current_trial = PRFTrial.from_table(self, self.trial_table[trial_idx])
+            self.current_trial_start_time = self.clock.getTime()
+            self.current_trial.run()
         
+        self.save_run_output()
         
-        if self.settings['PRF stimulus settings']['Screenshot']==True:
-            self.win.saveMovieFrames(opj(self.screen_dir, self.output_str+'_Screenshot.png'))
-            
         self.close()
 
-        
 
+    def score_responses(self):
+        """scores of the dot task (see scoring.py), from the responses recorded so far"""
+        return score_run(self.event_recorder.onsets('response'), self.dot_switch_color_times,
+                         self.config.response_interval, run_duration=self.total_time)
+
+    def save_run_output(self):
+        """prints the dot task scores, and saves them with the events, trials and settings of the run (see runoutput.py)"""
+        scores, hit_rts = self.score_responses()
+        
+        print(f"Expected number of responses: {scores['switches']}")
+        print(f"Total subject responses: {scores['responses']}")
+        print(f"Correct responses (within {self.config.response_interval}s of dot color change): {scores['hits']}")
+        print(f"False alarms: {scores['false_alarms']}, d': {scores['d_prime']:.2f}")
+        
+        save_run(opj(self.output_dir, self.output_str+'_run.npz'),
+                 run_metadata(self.output_str, self.config, total_time=self.total_time, plan_file=self.plan_file),
+                 scores=tuple(scores[name] for name in scores),
+                 reaction_times=hit_rts,
+                 dot_switch_color_times=self.dot_switch_color_times,
+                 events=self.event_recorder.events[:len(self.event_recorder)],
+                 trials=self.trial_table)
+
+
+    def close(self):
+        """adds the recorded key events to the global log before it is saved, and saves the frame timing"""
+        self.global_log = self.event_recorder.merge_into(self.global_log)
+        self.event_recorder.close()
+        
+        if self.config.trigger_emulator:
+            self.trigger_emulator.stop()
+        if self.input_poller is not None:
+            self.input_poller.stop()
+        if self.metrics_publisher is not None and self.metrics_publisher.is_alive():
+            self.metrics_publisher.stop()
+        
+        #per-frame timing log, saved next to the dot switch times
+        self.frame_timer.save(opj(self.output_dir, self.output_str+'_FrameTiming.npy'))
+        print_summary(self.frame_timer.summary())
+        
+        if self.profiler is not None:
+            self.profiler.stop()
+            self.profiler.save(opj(self.output_dir, self.output_str+'_run'), self.frame_timer.frames())
+            print("Profile saved in "+opj(self.output_dir, self.output_str+'_run_profile.txt'))
+            self.profiler = None
+        self.stimulus_log.close()
+        
+        if self.schedule is not None and self.schedule.start_time is not None:
+            onsets = self.schedule.onsets(self.frame_timer.frames())
+            np.save(opj(self.output_dir, self.output_str+'_TrialOnsets.npy'), onsets)
+            print_schedule_summary(self.schedule.summary(onsets))
+        
+        if self.config.screenshot:
+            print_screenshot_report(self.screenshot_writer.close())
+        
+        if self.assets is None:
+            super().close()
+        else:
+            #exptools2 closes the window, but the next runs still need it. SessionAssets.close closes it after the last run
+            self.win.close = lambda *args, **kwargs: None
+            try:
+                super().close()
+            finally:
+                del self.win.close
@@ -5,18 +5,20 @@ Created on Mon Feb 25 14:07:02 2019
 
 @author: marcoaqil
 """
-import numpy as np
 from psychopy import visual
 from psychopy import tools
 
+from textures import CheckerboardTextures, texture_size
+from plan import PHASE_TO_TEXTURE, bar_xy, flicker_phase
+
 
 class PRFStim(object):  
     def __init__(self, session, 
                         squares_in_bar=2 ,
                         bar_width_deg=1.25,
-                        tex_nr_pix=2048,
+                        tex_nr_pix=None,
                         flicker_frequency=6, 
-
+                        cache=None,
                         **kwargs):
         self.session = session
         self.squares_in_bar = squares_in_bar
@@ -24,177 +26,63 @@ class PRFStim(object):
         self.tex_nr_pix = tex_nr_pix
         self.flicker_frequency = flicker_frequency
 
-        #calculate the bar width in pixels, with respect to the texture
-        self.bar_width_in_pixels = tools.monitorunittools.deg2pix(bar_width_deg, self.session.monitor)*self.tex_nr_pix/self.session.win.size[1]
-        
-        
-        #construct basic space for textures
-        bar_width_in_radians = np.pi*self.squares_in_bar
-        bar_pixels_per_radian = bar_width_in_radians/self.bar_width_in_pixels
-        pixels_ls = np.linspace((-self.tex_nr_pix/2)*bar_pixels_per_radian,(self.tex_nr_pix/2)*bar_pixels_per_radian,self.tex_nr_pix)
-
-        tex_x, tex_y = np.meshgrid(pixels_ls, pixels_ls)
-        
-        #construct textues, alsoand making sure that also the single-square bar is centered in the middle
-        if squares_in_bar==1:
-            self.sqr_tex = np.sign(np.sin(tex_x-np.pi/2) * np.sin(tex_y))
-            self.sqr_tex_phase_1 = np.sign(np.sin(tex_x-np.pi/2) * np.sin(tex_y+np.sign(np.sin(tex_x-np.pi/2))*np.pi/4))
-            self.sqr_tex_phase_2 = np.sign(np.sign(np.abs(tex_x-np.pi/2)) * np.sin(tex_y+np.pi/2))
-        else:                
-            self.sqr_tex = np.sign(np.sin(tex_x) * np.sin(tex_y))   
-            self.sqr_tex_phase_1 = np.sign(np.sin(tex_x) * np.sin(tex_y+np.sign(np.sin(tex_x))*np.pi/4))
-            self.sqr_tex_phase_2 = np.sign(np.sign(np.abs(tex_x)) * np.sin(tex_y+np.pi/2))
-            
-        
-        bar_start_idx=int(np.round(self.tex_nr_pix/2-self.bar_width_in_pixels/2))
-        bar_end_idx=int(bar_start_idx+self.bar_width_in_pixels)+1
-
-        self.sqr_tex[:,:bar_start_idx] = 0       
-        self.sqr_tex[:,bar_end_idx:] = 0
-
-        self.sqr_tex_phase_1[:,:bar_start_idx] = 0                   
-        self.sqr_tex_phase_1[:,bar_end_idx:] = 0
+        #choose the texture size from the real window height and bar width, unless given explicitly
+        bar_width_in_screen_pixels = tools.monitorunittools.deg2pix(bar_width_deg, self.session.monitor)
+        if tex_nr_pix is None:
+            self.tex_nr_pix = texture_size(self.session.win.size[1], bar_width_in_screen_pixels, self.squares_in_bar)
 
-        self.sqr_tex_phase_2[:,:bar_start_idx] = 0                
-        self.sqr_tex_phase_2[:,bar_end_idx:] = 0
-        
-        
-        #construct stimuli with psychopy and textures in different position/phases
-        self.checkerboard_1 = visual.GratingStim(self.session.win,
-                                                 tex=self.sqr_tex,
-                                                 units='pix',
-                                                 size=[self.session.win.size[1],self.session.win.size[1]])
-        self.checkerboard_2 = visual.GratingStim(self.session.win,
-                                                 tex=self.sqr_tex_phase_1,                                               
-                                                 units='pix',
-                                                 size=[self.session.win.size[1],self.session.win.size[1]])
-        self.checkerboard_3 = visual.GratingStim(self.session.win,
-                                                 tex=self.sqr_tex_phase_2,                                                
-                                                 units='pix',
-                                                 size=[self.session.win.size[1],self.session.win.size[1]])
-        
+        #calculate the bar width in pixels, with respect to the texture
+        self.bar_width_in_pixels = bar_width_in_screen_pixels*self.tex_nr_pix/self.session.win.size[1]
         
+        #construct the three base textures (int8). all eight phases are derived from these.
+        #if a cache is given, textures generated in a previous run with the same parameters are reused
+        if cache is None:
+            self.textures = CheckerboardTextures(self.tex_nr_pix, self.bar_width_in_pixels, self.squares_in_bar)
+        else:
+            stack = cache.get_or_create('checkerboards', 
+                                        lambda: CheckerboardTextures(self.tex_nr_pix, self.bar_width_in_pixels, self.squares_in_bar).stack,
+                                        squares_in_bar=self.squares_in_bar,
+                                        bar_width_in_pixels=self.bar_width_in_pixels,
+                                        tex_nr_pix=self.tex_nr_pix,
+                                        win_size=list(self.session.win.size))
+            self.textures = CheckerboardTextures(self.tex_nr_pix, self.bar_width_in_pixels, self.squares_in_bar, stack=stack)
         
-        #for reasons of symmetry, some stimuli (4 and 8 in the order) are generated differently  if the bar has only one square
-        if self.squares_in_bar!=1:                
-            self.checkerboard_4 = visual.GratingStim(self.session.win,
-                                                     tex=np.fliplr(self.sqr_tex_phase_1),
-                                                     units='pix',
-                                                     size=[self.session.win.size[1],self.session.win.size[1]])
-            self.checkerboard_8 = visual.GratingStim(self.session.win,
-                                                     tex=-np.fliplr(self.sqr_tex_phase_1),
-                                                     units='pix',
-                                                     size=[self.session.win.size[1],self.session.win.size[1]])
-                
-        else:         
-            self.checkerboard_4 = visual.GratingStim(self.session.win, 
-                                                     tex=np.flipud(self.sqr_tex_phase_1),
-                                                     units='pix',
-                                                     size=[self.session.win.size[1],self.session.win.size[1]])
-            
-            self.checkerboard_8 = visual.GratingStim(self.session.win,
-                                                     tex=-np.flipud(self.sqr_tex_phase_1),
-                                                     units='pix',
-                                                     size=[self.session.win.size[1],self.session.win.size[1]])
+        #construct stimuli with psychopy and textures in different position/phases.
+        #phases 4-8 are flipped views or negated copies, which only exist while being uploaded
+        self.checkerboard_1 = self._make_checkerboard(1)
+        self.checkerboard_2 = self._make_checkerboard(2)
+        self.checkerboard_3 = self._make_checkerboard(3)
+        self.checkerboard_4 = self._make_checkerboard(4)
+        self.checkerboard_5 = self._make_checkerboard(5)
+        self.checkerboard_6 = self._make_checkerboard(6)
+        self.checkerboard_7 = self._make_checkerboard(7)
+        self.checkerboard_8 = self._make_checkerboard(8)
         
-        #all other textures are the same
-        self.checkerboard_5 = visual.GratingStim(self.session.win,
-                                                 tex=-self.sqr_tex,
-                                                 units='pix',
-                                                 size=[self.session.win.size[1],self.session.win.size[1]])
-            
-        self.checkerboard_6 = visual.GratingStim(self.session.win,
-                                                 tex=-self.sqr_tex_phase_1,
-                                                 units='pix',
-                                                 size=[self.session.win.size[1],self.session.win.size[1]])
-            
-        self.checkerboard_7 = visual.GratingStim(self.session.win,
-                                                 tex=-self.sqr_tex_phase_2,
-                                                 units='pix',
-                                                 size=[self.session.win.size[1],self.session.win.size[1]])
+        self.checkerboards = [self.checkerboard_1, self.checkerboard_2, self.checkerboard_3, self.checkerboard_4,
+                              self.checkerboard_5, self.checkerboard_6, self.checkerboard_7, self.checkerboard_8]
 
             
+    def _make_checkerboard(self, phase_nr):
+        return visual.GratingStim(self.session.win,
+                                  tex=self.textures.phase(phase_nr),
+                                  units='pix',
+                                  size=[self.session.win.size[1],self.session.win.size[1]])
 
         
     #this is the function that actually draws the stimulus. the sequence of different textures gives the illusion of motion.
     def draw(self, time, pos_in_ori, orientation,  bar_direction):
         
         #calculate position of the bar in relation to its orientation
-        x_pos, y_pos = np.cos((2.0*np.pi)*-orientation/360.0)*pos_in_ori, np.sin((2.0*np.pi)*-orientation/360.0)*pos_in_ori
+        x_pos, y_pos = bar_xy(orientation, pos_in_ori)
         
-        #convert current time to sine/cosine to decide which texture to draw
-        sin = np.sin(2*np.pi*time*self.flicker_frequency)
-        cos = np.cos(2*np.pi*time*self.flicker_frequency)
-
-        #set position, orientation, texture, and draw bar. bar moving up or down simply has reversed order of presentation
-        if bar_direction==0:
-            if sin > 0 and cos > 0 and cos > sin:
-                self.checkerboard_1.setPos([x_pos, y_pos])
-                self.checkerboard_1.setOri(orientation)
-                self.checkerboard_1.draw()
-            elif sin > 0 and cos > 0 and cos < sin:
-                self.checkerboard_2.setPos([x_pos, y_pos])
-                self.checkerboard_2.setOri(orientation)
-                self.checkerboard_2.draw()
-            elif sin > 0 and cos < 0 and np.abs(cos) < sin:
-                self.checkerboard_3.setPos([x_pos, y_pos])
-                self.checkerboard_3.setOri(orientation)
-                self.checkerboard_3.draw()
-            elif sin > 0 and cos < 0 and np.abs(cos) > sin:
-                self.checkerboard_4.setPos([x_pos, y_pos])
-                self.checkerboard_4.setOri(orientation)
-                self.checkerboard_4.draw()
-            elif sin < 0 and cos < 0 and cos < sin:
-                self.checkerboard_5.setPos([x_pos, y_pos])
-                self.checkerboard_5.setOri(orientation)
-                self.checkerboard_5.draw()
-            elif sin < 0 and cos < 0 and cos > sin:
-                self.checkerboard_6.setPos([x_pos, y_pos])
-                self.checkerboard_6.setOri(orientation)
-                self.checkerboard_6.draw()
-            elif sin < 0 and cos > 0 and cos < np.abs(sin):
-                self.checkerboard_7.setPos([x_pos, y_pos])
-                self.checkerboard_7.setOri(orientation)
-                self.checkerboard_7.draw()
-            else:
-                self.checkerboard_8.setPos([x_pos, y_pos])
-                self.checkerboard_8.setOri(orientation)
-                self.checkerboard_8.draw()
-        else:
-            if sin > 0 and cos > 0 and cos > sin:
-                self.checkerboard_8.setPos([x_pos, y_pos])
-                self.checkerboard_8.setOri(orientation)
-                self.checkerboard_8.draw()
-            elif sin > 0 and cos > 0 and cos < sin:
-                self.checkerboard_7.setPos([x_pos, y_pos])
-                self.checkerboard_7.setOri(orientation)
-                self.checkerboard_7.draw()
-            elif sin > 0 and cos < 0 and np.abs(cos) < sin:
-                self.checkerboard_6.setPos([x_pos, y_pos])
-                self.checkerboard_6.setOri(orientation)
-                self.checkerboard_6.draw()
-            elif sin > 0 and cos < 0 and np.abs(cos) > sin:
-                self.checkerboard_5.setPos([x_pos, y_pos])
-                self.checkerboard_5.setOri(orientation)
-                self.checkerboard_5.draw()
-            elif sin < 0 and cos < 0 and cos < sin:
-                self.checkerboard_4.setPos([x_pos, y_pos])
-                self.checkerboard_4.setOri(orientation)
-                self.checkerboard_4.draw()
-            elif sin < 0 and cos < 0 and cos > sin:
-                self.checkerboard_3.setPos([x_pos, y_pos])
-                self.checkerboard_3.setOri(orientation)
-                self.checkerboard_3.draw()
-            elif sin < 0 and cos > 0 and cos < np.abs(sin):
-                self.checkerboard_2.setPos([x_pos, y_pos])
-                self.checkerboard_2.setOri(orientation)
-                self.checkerboard_2.draw()
-            else:
-                self.checkerboard_1.setPos([x_pos, y_pos])
-                self.checkerboard_1.setOri(orientation)
-                self.checkerboard_1.draw()            
-            
-
-
-
-
+        #convert current time to the phase of the flicker cycle to decide which texture to draw
+        texture_index = PHASE_TO_TEXTURE[int(bar_direction), flicker_phase(time, self.flicker_frequency)]
+        
+        self.draw_texture(texture_index, [x_pos, y_pos], orientation)
+        
+    #frame loop version of draw: texture, position and orientation are looked up in the run plan
+    def draw_texture(self, texture_index, pos, orientation):
+        checkerboard = self.checkerboards[texture_index]
+        checkerboard.setPos(pos)
+        checkerboard.setOri(orientation)
+        checkerboard.draw()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+#the modules of the experiment are imported as they are when run from within the Experiment folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
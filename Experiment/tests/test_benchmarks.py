@@ -0,0 +1,23 @@
+import os
+
+import numpy as np
+
+from benchmarks import baseline_texture_index, bench_texture_selection
+from plan import PHASE_TO_TEXTURE, flicker_phase, load_config
+
+EXPERIMENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_baseline_chooses_the_same_textures():
+    #away from the boundaries between eighths of the flicker cycle, where the two only differ by rounding
+    flicker_frequency = 6.0
+    times = (np.arange(2000)+0.5)/(8*flicker_frequency)
+    for bar_direction in (0, 1):
+        baseline = [baseline_texture_index(t, flicker_frequency, bar_direction) for t in times]
+        assert baseline == PHASE_TO_TEXTURE[bar_direction, flicker_phase(times, flicker_frequency)].tolist()
+
+
+def test_texture_selection_results():
+    results = bench_texture_selection({'1R':load_config(os.path.join(EXPERIMENT_DIR, 'expsettings_1R.yml'))})
+    assert set(results) == {'texture_selection/1R/'+path for path in ('baseline', 'draw', 'run_plan')}
+    assert all(result['unit'] == 'ns' and result['value'] > 0 for result in results.values())
@@ -0,0 +1,101 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from dryrun import SESSION_ATTRIBUTES, HeadlessSetup, NullWindow, VirtualClock, VirtualTime, dry_run, scripted_keys
+from plan import create_plan, load_config, load_settings
+from runoutput import load_run
+
+EXPERIMENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_stand_ins_do_not_import_psychopy():
+    code = "import sys, dryrun; sys.exit(int('psychopy' in sys.modules or 'exptools2' in sys.modules))"
+    assert subprocess.run([sys.executable, '-c', code], cwd=EXPERIMENT_DIR).returncode == 0
+
+
+def test_flip_advances_virtual_time():
+    virtual_time = VirtualTime(frame_rate=50.0)
+    clock = VirtualClock(virtual_time)
+    win = NullWindow((800, 600), virtual_time)
+    flips = []
+    win.callOnFlip(lambda: flips.append(clock.getTime()))
+    win.flip()
+    win.flip()
+    assert flips == [pytest.approx(0.02)]
+    assert clock.getTime() == pytest.approx(0.04)
+    clock.reset()
+    assert clock.getTime() == 0.0
+
+
+class _Setup(HeadlessSetup):
+    """HeadlessSetup with the settings, monitor and log file that exptools2's Session would create"""
+
+    def _load_settings(self):
+        return load_settings(self.settings_file)
+
+    def _create_monitor(self):
+        return None
+
+    def _create_logfile(self):
+        return None
+
+
+def test_headless_setup(tmp_path):
+    output_dir = tmp_path/'logs'
+    setup = _Setup('dry-run_1R', output_dir=str(output_dir), settings_file=os.path.join(EXPERIMENT_DIR, 'expsettings_1R.yml'))
+    assert output_dir.is_dir()
+    missing = [name for name in SESSION_ATTRIBUTES if not hasattr(setup, name)]
+    assert missing == []
+
+    assert isinstance(setup.win, NullWindow)
+    assert list(setup.win.size) == list(setup.settings['window']['size'])
+    assert setup.win.monitorFramePeriod == pytest.approx(1/60.0)
+    #both exptools2 clocks run on the virtual time of the window
+    setup.timer.reset(-1.0)
+    setup.win.flip()
+    assert setup.clock.getTime() == pytest.approx(1/60.0)
+    assert setup.timer.getTime() == pytest.approx(1.0+1/60.0)
+    assert list(setup.global_log.columns) == ['trial_nr', 'onset', 'event_type', 'phase', 'response', 'nr_frames']
+
+
+def test_scripted_keys_of_a_preset():
+    config = load_config(os.path.join(EXPERIMENT_DIR, 'expsettings_4F.yml'))
+    plan = create_plan(config, win_height=1080, rng=np.random.default_rng(0))
+    switches = plan['dot_switch_color_times']
+    trial_number = len(plan['bar_orientation_at_TR'])
+    keys, times = scripted_keys(config, trial_number, switches, hit_rate=1.0, rng=np.random.default_rng(0))
+
+    assert np.all(np.diff(times) >= 0)
+    pulses = times[keys == config.sync_key]
+    responses = times[keys == 'b']
+    if config.scanner_sync:
+        assert len(pulses) == trial_number
+        assert pulses[0] > 0
+    #every switch is answered, 0.1 s or more after it
+    assert len(responses) == len(switches)
+    preceding = np.searchsorted(switches, responses, side='right')-1
+    assert np.all(preceding >= 0)
+    assert np.all(responses-switches[preceding] >= 0.1-1e-9)
+
+
+def test_dry_run_of_a_preset(tmp_path):
+    #the whole session, with the installed exptools2 and psychopy
+    pytest.importorskip('headless', reason="the dry run needs exptools2 and psychopy")
+    settings_file = os.path.join(EXPERIMENT_DIR, 'expsettings_4F.yml')
+    result = dry_run(settings_file, output_dir=str(tmp_path), seed=0)
+
+    output_str = 'dry-run_4F'
+    logs = tmp_path/(output_str+'_Logs')
+    for suffix in ('_DotSwitchColorTimes.npy', '_events.tsv', '_run.npz'):
+        assert (logs/(output_str+suffix)).exists(), suffix
+
+    run = load_run(str(logs/(output_str+'_run.npz')), ['scores', 'dot_switch_color_times', 'trials'])
+    assert np.array_equal(run['dot_switch_color_times'], np.load(logs/(output_str+'_DotSwitchColorTimes.npy')))
+    assert run['scores']['hits'][0] > 0
+    config = load_config(settings_file)
+    assert result['Virtual duration (s)'] >= (len(run['trials'])-1)*config.TR
+    assert result['Real duration (s)'] < result['Virtual duration (s)']
@@ -0,0 +1,27 @@
+import dataclasses
+import os
+
+import numpy as np
+import pytest
+
+from efficiency import canonical_hrf, evaluate
+from plan import load_config
+
+EXPERIMENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.mark.parametrize('sampling_interval', [0.5, 1.5, 5.0])
+def test_hrf_peaks_at_five_seconds(sampling_interval):
+    hrf = canonical_hrf(sampling_interval)
+    assert hrf.sum() == pytest.approx(1.0)
+    assert abs(sampling_interval*np.argmax(hrf)-5.0) <= sampling_interval/2
+
+
+def test_hrf_sampled_at_the_trial_duration():
+    #without scanner sync, each trial lasts the bar step length, whatever the TR
+    config = load_config(os.path.join(EXPERIMENT_DIR, 'expsettings_1R.yml'))
+    synced = dataclasses.replace(config, scanner_sync=True, TR=5.0, trial_duration=5.0)
+    not_synced = dataclasses.replace(config, scanner_sync=False, TR=1.5, bar_step_length=5.0, trial_duration=5.0)
+
+    kwargs = dict(resolution=12, nr_centers=5, sizes_deg=(1.0, 2.0))
+    assert evaluate(not_synced, **kwargs) == evaluate(synced, **kwargs)
@@ -0,0 +1,24 @@
+import time
+
+import numpy as np
+
+from inputs import InputPoller, PerfCounterClock, ScriptedSource, measure_timing
+
+
+def test_polled_timestamps():
+    errors, achieved_rate = measure_timing(rate=1000.0, nr_events=50, interval=0.005)
+    assert len(errors) == 50
+    #timestamps are taken when the key is polled, so never before the key
+    assert np.all(errors >= 0)
+    assert np.median(errors) < 0.005
+    assert achieved_rate > 200
+
+
+def test_keys_before_start_are_not_logged():
+    clock = PerfCounterClock()
+    source = ScriptedSource(['t', 'b', 'b'], [-1.0, -0.5, 0.02], clock)
+    poller = InputPoller(clock, source, rate=1000.0)
+    poller.start()
+    time.sleep(0.05)
+    poller.stop()
+    assert [key for key, _ in poller.drain()] == ['b']
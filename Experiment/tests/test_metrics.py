@@ -0,0 +1,121 @@
+import itertools
+import socket
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+
+from eventlog import EventRecorder
+from frametiming import FrameTimer
+from metrics import MetricsPublisher, SessionMetrics, format_snapshot, receive
+
+
+def _free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _snapshot(count):
+    return {'time':0.5*count, 'trial':count, 'expected_trs':100, 'pulses':count,
+            'dot_count':4, 'total_responses':3, 'correct_responses':3, 'false_alarms':0,
+            'frames':30*count, 'dropped_frames':0, 'recent_frame_ms':{'median':16.7, 'max':17.1}}
+
+
+class _Clock(object):
+
+    def __init__(self, t=0.0):
+        self.t = t
+
+    def getTime(self):
+        return self.t
+
+
+def _session(now, dot_switch_color_times):
+    """the parts of a PRFSession that SessionMetrics reads"""
+    clock = _Clock()
+    frame_timer = FrameTimer(clock, capacity=256)
+    for frame in range(int(now*60)):
+        clock.t = frame/60.0
+        frame_timer.start_frame(0)
+        frame_timer.end_draw()
+        frame_timer.flipped()
+    clock.t = now
+    return SimpleNamespace(clock=clock, frame_timer=frame_timer, event_recorder=EventRecorder(),
+                           win=SimpleNamespace(monitorFramePeriod=1/60.0), current_trial=None, trial_number=100,
+                           dot_switch_color_times=np.asarray(dot_switch_color_times, dtype=float),
+                           config=SimpleNamespace(response_interval=0.8))
+
+
+def test_snapshot_with_a_response_before_the_first_switch():
+    session = _session(1.0, [2.5, 6.0])
+    session.event_recorder.record(0, 0.7, 'response', 0, 'b')
+    snapshot = SessionMetrics(session).snapshot()
+    assert (snapshot['dot_count'], snapshot['total_responses']) == (0, 1)
+    assert (snapshot['correct_responses'], snapshot['false_alarms']) == (0, 1)
+    assert snapshot['frames'] == 60
+    assert snapshot['dropped_frames'] == 0
+
+
+def test_snapshot_counts_past_switches_only():
+    session = _session(3.0, [2.5, 6.0])
+    session.event_recorder.record(0, 2.9, 'response', 0, 'b')
+    snapshot = SessionMetrics(session).snapshot()
+    assert (snapshot['dot_count'], snapshot['correct_responses'], snapshot['false_alarms']) == (1, 1, 0)
+
+
+def test_publisher_to_local_listener():
+    port = _free_port()
+    counter = itertools.count()
+    received = []
+
+    def listen():
+        for snapshot in receive(port, timeout=5.0):
+            received.append(snapshot)
+            if len(received) == 3:
+                return
+
+    listener = threading.Thread(target=listen)
+    listener.start()
+    #the publisher keeps sending until the listener has bound its socket and received three snapshots
+    publisher = MetricsPublisher(lambda: _snapshot(next(counter)), port, rate=50.0)
+    publisher.start()
+    listener.join(10.0)
+    publisher.stop()
+
+    assert not listener.is_alive()
+    assert len(received) == 3
+    assert publisher.nr_sent >= 3
+    counts = [snapshot['trial'] for snapshot in received]
+    assert counts == sorted(counts)
+    assert received[0] == _snapshot(counts[0])
+    assert 'trial %d/100'%counts[0] in format_snapshot(received[0])
+
+
+def test_publish_without_listener():
+    publisher = MetricsPublisher(lambda: _snapshot(1), _free_port())
+    for _ in range(3):
+        publisher.publish()
+    assert publisher.nr_sent+publisher.nr_failed == 3
+    publisher.socket.close()
+
+
+def test_unserializable_snapshot_is_skipped():
+    publisher = MetricsPublisher(lambda: {'time':object()}, _free_port())
+    publisher.publish()
+    assert (publisher.nr_sent, publisher.nr_failed) == (0, 1)
+    publisher.socket.close()
+
+
+def test_failing_snapshot_does_not_stop_the_publisher():
+    def snapshot():
+        raise IndexError("snapshot failed")
+
+    publisher = MetricsPublisher(snapshot, _free_port(), rate=200.0)
+    publisher.start()
+    while publisher.nr_failed < 3 and publisher.is_alive():
+        threading.Event().wait(0.01)
+    assert publisher.is_alive()
+    publisher.stop()
+    assert publisher.nr_sent == 0
+    assert publisher.nr_failed >= 4
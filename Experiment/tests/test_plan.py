@@ -0,0 +1,46 @@
+import dataclasses
+import os
+
+import numpy as np
+import pytest
+
+from plan import create_plan, load_config, load_plan, save_plan
+
+EXPERIMENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _config(task):
+    return load_config(os.path.join(EXPERIMENT_DIR, 'expsettings_%s.yml'%task))
+
+
+@pytest.fixture
+def plan_file(tmp_path):
+    filename = str(tmp_path/'plan.npz')
+    save_plan(filename, create_plan(_config('1R'), rng=np.random.default_rng(0)))
+    return filename
+
+
+def test_plan_with_its_own_settings(plan_file):
+    config = _config('1R')
+    plan = load_plan(plan_file, win_height=config.win_size[1], config=config)
+    assert np.array_equal(plan['bar_pos_in_ori'], create_plan(config, rng=np.random.default_rng(0))['bar_pos_in_ori'])
+
+
+def test_plan_of_another_task_is_refused(plan_file):
+    with pytest.raises(ValueError, match='bar_pass_steps'):
+        load_plan(plan_file, config=_config('4F'))
+
+
+def test_plan_of_another_operating_system_is_refused(plan_file):
+    config = _config('1R')
+    other_os = 'mac' if config.operating_system != 'mac' else 'linux'
+    with pytest.raises(ValueError, match='operating_system'):
+        load_plan(plan_file, config=dataclasses.replace(config, operating_system=other_os))
+
+
+def test_plan_without_settings_is_refused(tmp_path):
+    plan = create_plan(_config('1R'), rng=np.random.default_rng(0))
+    filename = str(tmp_path/'old_plan.npz')
+    save_plan(filename, {key:value for key, value in plan.items() if not key.startswith('settings_')})
+    with pytest.raises(ValueError, match='Create it again'):
+        load_plan(filename, config=_config('1R'))
@@ -0,0 +1,36 @@
+from dryrun import NullWindow, VirtualTime
+from runs import SessionAssets, parse_run
+
+
+def _window(record_frame_intervals):
+    def create():
+        win = NullWindow((800, 600), VirtualTime())
+        win.recordFrameIntervals = record_frame_intervals
+        return win
+    return create
+
+
+def test_window_is_reused_as_created():
+    assets = SessionAssets()
+    win = assets.window(_window(True))
+    win.flip()
+    #what exptools2's Session.close does to the window
+    win.recordFrameIntervals = False
+
+    assert assets.window(_window(False)) is win
+    assert win.recordFrameIntervals
+    assert win.frameIntervals == []
+    win.flip()
+    assert len(win.frameIntervals) == 1
+
+
+def test_stimuli_are_reused_with_the_same_parameters():
+    assets = SessionAssets()
+    first = assets.get_or_create('prf_stim', object, bar_width_deg=1.25, monitor_distance=196)
+    assert assets.get_or_create('prf_stim', object, bar_width_deg=1.25, monitor_distance=196) is first
+    assert assets.get_or_create('prf_stim', object, bar_width_deg=1.25, monitor_distance=120) is not first
+    assert (assets.nr_created, assets.nr_reused) == (2, 1)
+
+
+def test_parse_run():
+    assert parse_run('task-1R:run-2') == ('task-1R', 'run-2')
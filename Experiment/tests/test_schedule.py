@@ -0,0 +1,76 @@
+import numpy as np
+
+from frametiming import FrameTimer
+from schedule import SCHEDULED_PHASE_MARGIN, TrialSchedule
+
+#a monitor refresh that no trial duration is a multiple of
+FRAME_PERIOD = 1/59.94
+
+
+class _Clock(object):
+
+    def __init__(self):
+        self.t = 0.0
+
+    def getTime(self):
+        return self.t
+
+
+def _run(phase_durations, dropped_frames=(), seed=0):
+    """
+    the frame loop of exptools2 (draw, flip, get_events) on a fake clock: flips are on the refresh grid, with some jitter,
+    and skip a refresh at the frames in dropped_frames. returns the trial onsets and the time each trial exited
+    """
+    rng = np.random.default_rng(seed)
+    dropped_frames = set(dropped_frames)
+    clock = _Clock()
+    frame_timer = FrameTimer(clock)
+    schedule = TrialSchedule(phase_durations, frame_period=FRAME_PERIOD)
+
+    refresh = 0
+    exit_times = []
+    for trial_nr in range(len(schedule)):
+        while True:
+            frame_timer.start_frame(trial_nr)
+            frame_timer.end_draw()
+            refresh += 2 if frame_timer.nr_frames in dropped_frames else 1
+            clock.t = refresh*FRAME_PERIOD+rng.uniform(0, 0.0005)
+            frame_timer.flipped()
+            clock.t += 0.001
+            if schedule.trial_over(trial_nr, clock.getTime()):
+                exit_times.append(clock.t)
+                break
+
+    return schedule, schedule.onsets(frame_timer.frames()), np.array(exit_times)
+
+
+def _phase_durations(nr_trials=320):
+    #1.5 s trials, with a longer blank every 20 trials
+    phase_durations = np.full(nr_trials, 1.5)
+    phase_durations[::20] = 12.0
+    return phase_durations
+
+
+def test_onsets_within_one_frame():
+    schedule, onsets, _ = _run(_phase_durations())
+    assert len(onsets) == 320
+    assert np.all(np.abs(onsets['error']) < FRAME_PERIOD)
+    summary = schedule.summary(onsets)
+    assert summary['Trials within one frame'] == 320
+
+
+def test_dropped_frames_do_not_accumulate():
+    phase_durations = _phase_durations()
+    rng = np.random.default_rng(1)
+    dropped_frames = rng.choice(int(np.sum(phase_durations)/FRAME_PERIOD), 200, replace=False)
+    schedule, onsets, exit_times = _run(phase_durations, dropped_frames)
+
+    #only an onset on a dropped frame is late, and by one frame at most
+    assert np.all(np.abs(onsets['error']) < 2*FRAME_PERIOD)
+    assert np.mean(np.abs(onsets['error']) < FRAME_PERIOD) > 0.95
+    assert abs(onsets['error'][-1]) < 2*FRAME_PERIOD
+
+    #a trial outlasts its phase duration by a few frames, far from the margin that keeps exptools2 from ending it
+    trial_lengths = exit_times-onsets['onset']
+    assert np.all(trial_lengths-phase_durations < 3*FRAME_PERIOD)
+    assert np.all(trial_lengths < phase_durations+SCHEDULED_PHASE_MARGIN)
@@ -0,0 +1,35 @@
+import numpy as np
+
+from scoring import score_run, score_runs
+
+
+def test_hits_misses_and_false_alarms():
+    scores, hit_rts = score_run([1.3, 1.5, 4.0, 9.0], [1.0, 3.8, 6.0], 0.8, run_duration=10.0)
+    assert (scores['switches'], scores['responses']) == (3, 4)
+    assert (scores['hits'], scores['misses'], scores['false_alarms']) == (2, 1, 2)
+    np.testing.assert_allclose(hit_rts, [0.3, 0.2])
+    assert np.isfinite(scores['d_prime'])
+
+
+def test_responses_without_switches():
+    scores, hit_rts = score_run([1.0, 2.5], [], 0.8, run_duration=4.0)
+    assert (scores['hits'], scores['misses'], scores['false_alarms']) == (0, 0, 2)
+    assert len(hit_rts) == 0
+    assert np.isnan(scores['hit_rate'])
+    assert np.isnan(scores['d_prime'])
+
+
+def test_no_switches_and_no_responses():
+    scores, _ = score_run([], [], 0.8)
+    assert (scores['hits'], scores['false_alarms']) == (0, 0)
+    assert np.isnan(scores['hit_rate'])
+    assert np.isnan(scores['d_prime'])
+
+
+def test_run_without_switches_next_to_other_runs():
+    scores, hit_rts = score_runs([[1.2], [0.5, 1.2], [3.1]], [[1.0], [], [3.0]], 0.8)
+    assert scores['hits'].tolist() == [1, 0, 1]
+    assert scores['false_alarms'].tolist() == [0, 2, 0]
+    assert np.isnan(scores['d_prime'][1])
+    assert np.isfinite(scores['d_prime'][[0, 2]]).all()
+    assert [len(rts) for rts in hit_rts] == [1, 0, 1]
@@ -0,0 +1,35 @@
+import os
+
+import numpy as np
+import pytest
+
+from screenshots import ScreenshotWriter, process_frame
+
+
+def test_process_frame():
+    frame = np.full((4, 6, 3), 128, dtype=np.uint8)
+    frame[:2, :2] = 255
+    assert process_frame(frame, downsample=2).shape == (2, 3, 3)
+    binary = process_frame(frame, downsample=2, binarize=50)
+    assert binary.dtype == np.uint8
+    assert binary.tolist() == [[255, 0, 0], [0, 0, 0]]
+
+
+def test_workers_start_with_the_writer(tmp_path):
+    writer = ScreenshotWriter(str(tmp_path), 'run', n_workers=2)
+    #all workers run before the first capture, so none is started from the frame loop
+    assert len(writer.pool._processes) == 2
+    assert writer.pool._mp_context.get_start_method() == 'spawn'
+    assert writer.close()['Screenshots'] == 0
+
+
+def test_writer_saves_frames(tmp_path):
+    pytest.importorskip('PIL')
+    writer = ScreenshotWriter(str(tmp_path), 'run', downsample=2, max_queue=2, n_workers=2)
+    for _ in range(5):
+        writer.submit(np.full((20, 30, 3), 128, dtype=np.uint8))
+    report = writer.close()
+
+    assert report['Screenshots'] == 5 and report['Errors'] == 0
+    assert report['Max frames in flight'] <= 2
+    assert sorted(os.listdir(tmp_path)) == ['run_Screenshot%03d.png'%i for i in range(1, 6)]
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 09:12:40 2026
+
+Generation of the checkerboard textures used by PRFStim.
+
+The checkerboards are separable in x and y: each texel is the product of the
+sign of a sine along the columns and the sign of a (shifted) sine along the rows.
+We therefore only evaluate 1D sign vectors and fill the int8 textures row-tile
+by row-tile, without ever building the full float meshgrids.
+"""
+
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+
+#rows filled per step. keeps temporaries small even for 8192 pixel textures
+TILE_ROWS = 256
+
+
+def texture_size(win_height, bar_width_in_screen_pixels=None, squares_in_bar=1,
+                 min_texels_per_square=4, min_pix=256, max_pix=8192):
+    """choose the texture size (a power of two, as required by psychopy) from the window height and bar width"""
+    tex_nr_pix = min_pix
+    while tex_nr_pix < win_height and tex_nr_pix < max_pix:
+        tex_nr_pix *= 2
+
+    #make sure each square in the bar is still sampled by a few texels
+    if bar_width_in_screen_pixels is not None:
+        while tex_nr_pix < max_pix and \
+            bar_width_in_screen_pixels*tex_nr_pix/win_height < min_texels_per_square*squares_in_bar:
+            tex_nr_pix *= 2
+
+    return tex_nr_pix
+
+
+class CheckerboardTextures(object):
+    """the three base checkerboard textures (int8, values -1/0/1), from which all eight phases are derived"""
+
+    def __init__(self, tex_nr_pix, bar_width_in_pixels, squares_in_bar, tile_rows=TILE_ROWS, stack=None):
+        self.tex_nr_pix = int(tex_nr_pix)
+        self.bar_width_in_pixels = bar_width_in_pixels
+        self.squares_in_bar = squares_in_bar
+
+        #the three base textures are stored as one (3, tex_nr_pix, tex_nr_pix) array, so they can be cached as a single file
+        if stack is None:
+            stack = self.generate(tile_rows)
+        elif stack.shape != (3, self.tex_nr_pix, self.tex_nr_pix):
+            raise ValueError(f"Texture stack has shape {stack.shape}, expected {(3, self.tex_nr_pix, self.tex_nr_pix)}")
+
+        self.stack = stack
+        self.sqr_tex = stack[0]
+        self.sqr_tex_phase_1 = stack[1]
+        self.sqr_tex_phase_2 = stack[2]
+
+    def generate(self, tile_rows=TILE_ROWS):
+        #construct basic space for textures (1D only: the textures are separable)
+        bar_width_in_radians = np.pi*self.squares_in_bar
+        bar_pixels_per_radian = bar_width_in_radians/self.bar_width_in_pixels
+        pixels_ls = np.linspace((-self.tex_nr_pix/2)*bar_pixels_per_radian,(self.tex_nr_pix/2)*bar_pixels_per_radian,self.tex_nr_pix)
+
+        #making sure that also the single-square bar is centered in the middle
+        if self.squares_in_bar==1:
+            x_ls = pixels_ls-np.pi/2
+        else:
+            x_ls = pixels_ls
+
+        bar_start_idx=int(np.round(self.tex_nr_pix/2-self.bar_width_in_pixels/2))
+        bar_end_idx=int(bar_start_idx+self.bar_width_in_pixels)+1
+        bar_columns = slice(max(bar_start_idx, 0), min(bar_end_idx, self.tex_nr_pix))
+
+        #column (x) signs, only inside the bar. everything outside the bar is 0
+        x_bar = x_ls[bar_columns]
+        sign_x = np.sign(np.sin(x_bar)).astype(np.int8)
+        nonzero_x = np.sign(np.abs(x_bar)).astype(np.int8)
+
+        #row (y) signs, for each of the shifts used by the three phases
+        sign_y = np.sign(np.sin(pixels_ls)).astype(np.int8)
+        sign_y_plus = np.sign(np.sin(pixels_ls+np.pi/4)).astype(np.int8)
+        sign_y_minus = np.sign(np.sin(pixels_ls-np.pi/4)).astype(np.int8)
+        sign_y_half = np.sign(np.sin(pixels_ls+np.pi/2)).astype(np.int8)
+
+        x_pos = sign_x > 0
+        x_neg = sign_x < 0
+
+        stack = np.zeros((3, self.tex_nr_pix, self.tex_nr_pix), dtype=np.int8)
+
+        for r0 in range(0, self.tex_nr_pix, tile_rows):
+            rows = slice(r0, min(r0+tile_rows, self.tex_nr_pix))
+
+            #sign(sin(x)*sin(y))
+            np.multiply(sign_y[rows, None], sign_x[None, :], out=stack[0, rows, bar_columns])
+
+            #sign(sin(x)*sin(y+sign(sin(x))*pi/4))
+            tile = stack[1, rows, bar_columns]
+            tile[:, x_pos] = sign_y_plus[rows, None]
+            tile[:, x_neg] = -sign_y_minus[rows, None]
+
+            #sign(sign(abs(x))*sin(y+pi/2))
+            np.multiply(sign_y_half[rows, None], nonzero_x[None, :], out=stack[2, rows, bar_columns])
+
+        return stack
+
+    def nbytes(self):
+        return self.stack.nbytes
+
+    def _flipped_phase_1(self):
+        #for reasons of symmetry, phases 4 and 8 are generated differently if the bar has only one square
+        if self.squares_in_bar!=1:
+            return np.fliplr(self.sqr_tex_phase_1)
+        else:
+            return np.flipud(self.sqr_tex_phase_1)
+
+    def phase(self, nr):
+        """texture for checkerboard_<nr> (1 to 8). phases 1-4 are views, 5-8 are negated copies made at upload time"""
+        if nr==1:
+            return self.sqr_tex
+        elif nr==2:
+            return self.sqr_tex_phase_1
+        elif nr==3:
+            return self.sqr_tex_phase_2
+        elif nr==4:
+            return self._flipped_phase_1()
+        elif 5<=nr<=8:
+            return -self.phase(nr-4)
+        else:
+            raise ValueError(f"Checkerboard phase must be between 1 and 8, got {nr}")
+
+
+def benchmark(tex_sizes, bar_width_in_pixels_at_2048=40, squares_in_bar=2, repeats=3):
+    """report construction time and peak (traced) memory for each texture size"""
+    results = []
+    for tex_nr_pix in tex_sizes:
+        #keep the bar the same fraction of the texture
+        bar_width_in_pixels = bar_width_in_pixels_at_2048*tex_nr_pix/2048
+
+        times = []
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            CheckerboardTextures(tex_nr_pix, bar_width_in_pixels, squares_in_bar)
+            times.append(time.perf_counter()-t0)
+
+        tracemalloc.start()
+        textures = CheckerboardTextures(tex_nr_pix, bar_width_in_pixels, squares_in_bar)
+        #the largest derived phase exists only transiently, during upload
+        textures.phase(8)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        results.append({'tex_nr_pix':tex_nr_pix,
+                        'construction time (s)':min(times),
+                        'peak memory (MB)':peak/2**20,
+                        'texture memory (MB)':textures.nbytes()/2**20})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Construction time and peak memory of the PRF checkerboard textures")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1024, 2048, 4096, 8192])
+    parser.add_argument('--squares', type=int, default=2)
+    parser.add_argument('--bar-width', type=float, default=40, help="bar width in texture pixels, at 2048 pixels")
+    args = parser.parse_args()
+
+    for res in benchmark(args.sizes, args.bar_width, args.squares):
+        print("tex_nr_pix %5d: %8.3f s, peak %8.1f MB, textures %8.1f MB"%(res['tex_nr_pix'],
+                                                                         res['construction time (s)'],
+                                                                         res['peak memory (MB)'],
+                                                                         res['texture memory (MB)']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 17:42:09 2026
+
+Scanner trigger emulator: a background thread that injects the sync key into
+the psychopy event queue (or the input poller, see inputs.py) every TR, optionally with jitter and dropped pulses,
+so that scanner sync can be tested without a scanner. Enable it in the settings
+file under "mri:", as "trigger emulator: True".
+
+The benchmark runs the first TRs of each settings file with the emulator, and
+reports the latency from each pulse to the first flip showing the new bar
+position. Run from within the Experiment folder:
+    python triggers.py expsettings_1R.yml expsettings_4F.yml --trs 40
+"""
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+opj = os.path.join
+
+
+def pulse_schedule(TR, jitter=0.0, dropped_pulse_rate=0.0, rng=None):
+    """(time, dropped) of each pulse, from the first pulse at time 0 onwards"""
+    if rng is None:
+        rng = np.random.default_rng()
+
+    pulse_nr = 0
+    while True:
+        offset = jitter*rng.standard_normal() if jitter > 0 else 0.0
+        yield max(pulse_nr*TR+offset, 0.0), bool(rng.random() < dropped_pulse_rate)
+        pulse_nr += 1
+
+
+def inject_key(key):
+    """adds a key press to the psychopy event queue, like psychopy.hardware.emulator.SyncGenerator"""
+    from psychopy import event
+    event._onPygletKey(symbol=key, modifiers=0, emulated=True)
+
+
+class TriggerEmulator(threading.Thread):
+
+    def __init__(self, TR, key='t', jitter=0.0, dropped_pulse_rate=0.0, rng=None, inject=inject_key):
+        super().__init__(daemon=True)
+        self.TR = TR
+        self.key = key
+        self.jitter = jitter
+        self.dropped_pulse_rate = dropped_pulse_rate
+        self.rng = rng
+        self.inject = inject
+
+        #time.perf_counter() of the injected pulses, and number of dropped pulses
+        self.pulse_times = []
+        self.nr_dropped = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        start = time.perf_counter()
+        for pulse_time, dropped in pulse_schedule(self.TR, self.jitter, self.dropped_pulse_rate, self.rng):
+            #absolute deadlines, so that the pulses do not drift
+            if self._stop_event.wait(max(start+pulse_time-time.perf_counter(), 0.0)):
+                return
+            if dropped:
+                self.nr_dropped += 1
+            else:
+                self.inject(self.key)
+                self.pulse_times.append(time.perf_counter())
+
+    def stop(self):
+        self._stop_event.set()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join()
+
+    @classmethod
+    def from_config(cls, config, rng=None, inject=inject_key):
+        return cls(config.TR, key=config.sync_key, jitter=config.trigger_jitter,
+                   dropped_pulse_rate=config.dropped_pulse_rate, rng=rng, inject=inject)
+
+
+def latency_summary(frames, percentiles=(50, 95, 99, 100)):
+    """percentiles (ms) of the pulse to flip latency, from the frames logged by frametiming.FrameTimer"""
+    latencies = 1000*frames['trigger_to_flip'][np.isfinite(frames['trigger_to_flip'])]
+    summary = {'Pulses':len(latencies)}
+    if len(latencies):
+        summary.update({f"p{p} (ms)":v for p, v in zip(percentiles, np.percentile(latencies, percentiles))})
+    return summary
+
+
+def benchmark(settings_file, trs=40, jitter=None, dropped_pulse_rate=None, output_dir=None):
+    """runs the first trs TRs of a settings file with the trigger emulator, and summarizes the latencies"""
+    import yaml
+    from plan import load_settings
+    from session import PRFSession
+
+    settings = load_settings(settings_file)
+    settings['mri']['trigger emulator'] = True
+    if jitter is not None:
+        settings['mri']['trigger jitter'] = jitter
+    if dropped_pulse_rate is not None:
+        settings['mri']['dropped pulse rate'] = dropped_pulse_rate
+    settings['PRF stimulus settings']['Scanner sync'] = True
+    settings['PRF stimulus settings']['Screenshot'] = False
+
+    if output_dir is None:
+        output_dir = tempfile.mkdtemp(prefix='trigger_benchmark_')
+    output_str = 'trigger-benchmark_'+os.path.basename(settings_file)[len('expsettings_'):-len('.yml')]
+    benchmark_settings_file = opj(output_dir, output_str+'_settings.yml')
+    with open(benchmark_settings_file, 'w') as f:
+        yaml.safe_dump(settings, f)
+
+    session = PRFSession(output_str=output_str, output_dir=output_dir, settings_file=benchmark_settings_file)
+    session.trial_number = min(session.trial_number, trs)
+    session.run()
+
+    summary = latency_summary(session.frame_timer.frames())
+    summary['Dropped pulses'] = session.trigger_emulator.nr_dropped
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pulse to flip latency with emulated scanner triggers")
+    parser.add_argument('settings_files', nargs='+')
+    parser.add_argument('--trs', type=int, default=40, help="number of TRs to run per settings file")
+    parser.add_argument('--jitter', type=float, default=None, help="default: trigger jitter in the settings file")
+    parser.add_argument('--dropped-pulse-rate', type=float, default=None, help="default: dropped pulse rate in the settings file")
+    parser.add_argument('--output-dir', default=None)
+    args = parser.parse_args(argv)
+
+    for settings_file in args.settings_files:
+        summary = benchmark(settings_file, args.trs, args.jitter, args.dropped_pulse_rate, args.output_dir)
+        print(settings_file+": "+", ".join(f"{name} {value:.2f}" if isinstance(value, float) else f"{name} {value}"
+                                           for name, value in summary.items()))
+
+
+if __name__ == '__main__':
+    main()